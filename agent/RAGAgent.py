@@ -1,17 +1,19 @@
 import asyncio
-import os
-import uuid
 from typing import TypedDict, List, Annotated, Literal, Optional
 
 from langchain_core.documents import Document
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langgraph.graph import add_messages, StateGraph
 from pydantic import BaseModel, Field
 
-from tools.rag_tool import rag_retriever
+from deadline import get_deadline, running_low, with_deadline
+from experts import get_llm, registry
+from rewritememo import RewriteMemo
+from tools.executor import deadline_config
+from tools.rag_tool import answer_cache_config, rag_agent_config, rag_tool, rerank_config
 
 
 class RAGState(TypedDict):
@@ -20,23 +22,68 @@ class RAGState(TypedDict):
     question: str   # Rewrite node 会修改关键词
     retry_count: int
     grade: Optional[str]      # "yes" or "no"
+    origin: str     # 用户原始问题，改写备忘以它为键
+    retrieved_ids: Optional[List[str]]  # 上一次检索到的段 id
+    unchanged: bool     # 本次检索结果与上一次相同
+    queries: Optional[List[str]]    # multi_query 模式下的查询变体
+    degraded: bool      # 因时间将尽跳过了评审/改写/查询扩展，结果不写入缓存和备忘
 
 
-async def retrieve(state: RAGState):
-    question = state['question']
+mode = rag_agent_config.get("mode", "rewrite")
+num_queries = rag_agent_config.get("num_queries", 3)
+max_retries = rag_agent_config.get("max_retries", 3)
+early_exit = rag_agent_config.get("early_exit", True)
+# 剩余时间少于该值时不再改写、不再 LLM 评审，直接用已检索到的资料生成
+reserve = deadline_config.get("reserve_seconds", 10)
+
+# 重量级依赖（嵌入模型、Chroma、重排模型、LLM 客户端等）不在导入时创建，由 build() 在首次使用或预热时创建一次
+rag_retriever = None
+llm = None
+structured_llm = None
+variants_llm = None
+reranker = None
+packer = None
+memo = None
+answer_cache = None
+
+
+async def retrieve_query(question: str):
+    """检索单个查询，先查检索备忘"""
+    version = rag_tool.rag.index_version()
+    ids = memo.get_retrieval(question, version) if memo else None
+    if ids is not None:
+        from retriever import get_documents_by_ids
+        docs = await asyncio.to_thread(get_documents_by_ids, rag_tool.retriever.vectorstore, ids)
+        print(f"💾 检索备忘命中: {question}")
+        return docs, ids
+
     docs = await rag_retriever.ainvoke(question)
-    return {"documents": docs}
+    ids = [doc.id for doc in docs]
+    if memo and all(ids):
+        memo.set_retrieval(question, ids, version)
+    return docs, ids
+
+
+async def retrieve(state: RAGState):
+    docs, ids = await retrieve_query(state['question'])
+
+    previous = state.get("retrieved_ids")
+    if early_exit and previous is not None and set(previous) == set(ids):
+        # 改写后检索到的还是上次评审不通过的那些段，再评审、再改写也不会有结果
+        print("⏹️ 改写后检索结果未变化，提前结束")
+        return {"documents": [], "retrieved_ids": ids, "unchanged": True}
+    return {"documents": docs, "retrieved_ids": ids, "unchanged": False}
 
 
 class Grade(BaseModel):
     grade: Literal["yes", "no"] = Field(description="只回答 'yes' or 'no'")
 
-llm = ChatOpenAI(model=os.getenv("MODEL_NAME"))
-structured_llm = llm.with_structured_output(Grade)
 
-async def grade_documents(state: RAGState):
-    question = state['question']
-    documents = state['documents']
+class QueryVariants(BaseModel):
+    queries: List[str] = Field(description="改写后的检索查询，每条表述不同")
+
+
+async def llm_grade(question: str, documents: List[Document]) -> List[str]:
     template = PromptTemplate.from_template("""
     你是一个评审员。
     这是用户的问题：{question}
@@ -51,7 +98,42 @@ async def grade_documents(state: RAGState):
         tasks.append(task)
 
     results = await asyncio.gather(*tasks)
-    grades = [res.grade for res in results]
+    return [res.grade for res in results]
+
+
+async def grade_documents(state: RAGState, config: RunnableConfig):
+    question = state['question']
+    documents = state['documents']
+    # 时间将尽时跳过 LLM 评审，未评审的段直接保留
+    low = running_low(config, reserve)
+
+    if reranker is None:
+        if low:
+            print("⏱️ 剩余时间不足，跳过评审")
+            grades = ["yes"] * len(documents)
+        else:
+            grades = await llm_grade(question, documents)
+    else:
+        # cross-encoder 一次批量打分，只有拿不准的段才交给 LLM
+        scores = await reranker.ascore(question, [d.page_content for d in documents])
+        grades = reranker.grade(scores)
+        borderline = [i for i, grade in enumerate(grades) if grade is None]
+        if borderline and low:
+            print(f"⏱️ 剩余时间不足，{len(borderline)} 段跳过 LLM 复核直接保留")
+            for i in borderline:
+                grades[i] = "yes"
+            borderline = []
+        if borderline:
+            llm_grades = await llm_grade(question, [documents[i] for i in borderline])
+            for i, grade in zip(borderline, llm_grades):
+                grades[i] = grade
+        print(f"📊 重排评审：{len(documents)} 段，LLM 复核 {len(borderline)} 段")
+        # 按重排得分从高到低排列，生成时相关度高的段在前
+        for doc, score in zip(documents, scores):
+            doc.metadata["rerank_score"] = float(score)
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])
+        documents = [documents[i] for i in order]
+        grades = [grades[i] for i in order]
 
     reduced_docs = []
     for item in list(zip(documents, grades)):
@@ -59,14 +141,20 @@ async def grade_documents(state: RAGState):
         if grade == "yes":
             reduced_docs.append(doc)
 
+    if memo and not low:
+        version = rag_tool.rag.index_version()
+        memo.set_grade(state['origin'], state['retry_count'], "yes" if reduced_docs else "no", version)
+
     if not reduced_docs:
         return {
             "documents": [],
-            "grade": "no"
+            "grade": "no",
+            "degraded": state.get("degraded", False) or low,
         }
     return {
         "documents": reduced_docs,
-        "grade": "yes"
+        "grade": "yes",
+        "degraded": state.get("degraded", False) or low,
     }
 
 
@@ -79,7 +167,10 @@ async def generate(state: RAGState):
         final_answer = "抱歉，经过多次检索，我依然没有在知识库中找到与该问题相关的信息。建议您尝试更换关键词或查阅其他来源。"
         return {"messages": [AIMessage(content=final_answer)]}
 
-    docs = "\n\n".join(doc.page_content for doc in documents)
+    docs, stats = packer.pack(documents)
+    print(f"📦 上下文打包: {stats['chunks']} 段 -> {stats['blocks']} 块，"
+          f"{stats['raw_tokens']} -> {stats['packed_tokens']} token（节省 {stats['saved_tokens']}）"
+          f"{'，已按预算截断' if stats['truncated'] else ''}")
     prompt = f"""
     这是用户的提问：{question}
     这是 RAG 检索到的相关信息：{docs}
@@ -92,6 +183,15 @@ async def generate(state: RAGState):
 async def rewrite(state: RAGState):
     question = state['question']
     current_attempt = state.get("retry_count", 0)
+    version = rag_tool.rag.index_version()
+    cached = memo.get_rewrite(state['origin'], current_attempt + 1, version) if memo else None
+    if cached is not None:
+        print(f"💾 改写备忘命中: {question} -> {cached} (第 {current_attempt + 1} 次尝试)")
+        return {
+            "question": cached,
+            "retry_count": current_attempt + 1
+        }
+
     prompt = f"""
     用户的问题是：{question}
     初次检索没有发现相关信息。
@@ -100,6 +200,8 @@ async def rewrite(state: RAGState):
     """
     result = await llm.ainvoke(prompt)
     print(f"🔄 改写问题: {question} -> {result.content} (第 {current_attempt + 1} 次尝试)")
+    if memo:
+        memo.set_rewrite(state['origin'], current_attempt + 1, result.content, version)
     return {
         "question": result.content,
         "retry_count": current_attempt + 1
@@ -112,15 +214,24 @@ graph.add_node("grade", grade_documents)
 graph.add_node("rewrite", rewrite)
 graph.add_node("generate", generate)
 graph.set_entry_point("rag")
-graph.add_edge("rag", "grade")
 
-def grade_continue(state: RAGState):
+def retrieve_continue(state: RAGState):
+    if state.get("unchanged"):
+        return "generate"
+    return "grade"
+
+graph.add_conditional_edges("rag", retrieve_continue)
+
+def grade_continue(state: RAGState, config: RunnableConfig):
     grade = state['grade']
     retry_count = state['retry_count']
     if grade == "yes":
         return "generate"
     else:
-        if retry_count < 3:
+        if state.get("degraded") or running_low(config, reserve):
+            print("⏱️ 剩余时间不足，不再改写")
+            return "generate"
+        if retry_count < max_retries:
             return "rewrite"
         else:
             return "generate"
@@ -130,8 +241,94 @@ graph.add_edge("rewrite", "rag")
 graph.add_edge("generate", "__end__")
 app = graph.compile()
 
+
+# ==========================
+# multi_query 模式：一次 LLM 调用生成多个查询变体，并发检索，合并后只评审一次
+# ==========================
+
+async def expand(state: RAGState, config: RunnableConfig):
+    question = state['question']
+    if running_low(config, reserve):
+        print("⏱️ 剩余时间不足，仅使用原问题检索")
+        return {"queries": [question], "degraded": True}
+    prompt = f"""
+    用户的问题是：{question}
+    请从不同角度（同义词、专业术语、关键词组合等）给出 {num_queries - 1} 个适合检索知识库的查询。
+    只输出查询本身，不要包含解释。
+    """
+    try:
+        result = await variants_llm.ainvoke(prompt)
+        variants = [q.strip() for q in result.queries if q.strip()]
+    except Exception as e:
+        print(f"⚠️ 查询变体生成失败，仅使用原问题检索: {e}")
+        variants = []
+    queries = list(dict.fromkeys([question] + variants))[:num_queries]
+    print(f"🔀 查询变体: {queries}")
+    return {"queries": queries}
+
+
+async def retrieve_multi(state: RAGState):
+    results = await asyncio.gather(*(retrieve_query(q) for q in state['queries']))
+    # 按段 id 去重，保留首次出现的顺序（原问题的结果在前）
+    seen, docs = set(), []
+    for query_docs, _ in results:
+        for doc in query_docs:
+            key = doc.id or doc.page_content
+            if key not in seen:
+                seen.add(key)
+                docs.append(doc)
+    return {"documents": docs, "retrieved_ids": [doc.id for doc in docs]}
+
+
+multi_query_graph = StateGraph(RAGState)
+multi_query_graph.add_node("expand", expand)
+multi_query_graph.add_node("rag", retrieve_multi)
+multi_query_graph.add_node("grade", grade_documents)
+multi_query_graph.add_node("generate", generate)
+multi_query_graph.set_entry_point("expand")
+multi_query_graph.add_edge("expand", "rag")
+multi_query_graph.add_edge("rag", "grade")
+multi_query_graph.add_edge("grade", "generate")
+multi_query_graph.add_edge("generate", "__end__")
+multi_query_app = multi_query_graph.compile()
+
+rag_app = multi_query_app if mode == "multi_query" else app
+
+
+def build():
+    """
+    创建 RAG 专家的重量级依赖，返回要使用的子图。
+    由专家注册表调用一次（首次调用 call_rag_expert 或服务预热时），不要在导入时调用
+    """
+    global rag_retriever, llm, structured_llm, variants_llm, reranker, packer, memo, answer_cache
+    from answercache import SemanticAnswerCache
+    from contextpacker import ContextPacker
+    from reranker import CrossEncoderReranker
+
+    # 加载嵌入模型、打开 Chroma、同步 BM25 索引
+    rag_retriever = rag_tool.build()
+
+    llm = get_llm()
+    structured_llm = llm.with_structured_output(Grade)
+    variants_llm = llm.with_structured_output(QueryVariants)
+
+    if rerank_config.get("enable", False):
+        # build 在预热（或首次使用）时执行，这里一并加载模型，避免第一个请求评审时才加载
+        reranker = CrossEncoderReranker(**{k: v for k, v in rerank_config.items() if k != "enable"}).load()
+    packer = ContextPacker(**rag_agent_config.get("context", {}))
+    memo = RewriteMemo(rag_agent_config["memo_path"]) if rag_agent_config.get("memo_path") else None
+
+    if answer_cache_config.get("enable", False):
+        answer_cache = SemanticAnswerCache(
+            rag_tool.rag.embedding,
+            version_fn=rag_tool.rag.index_version,
+            **{k: v for k, v in answer_cache_config.items() if k != "enable"},
+        )
+    return rag_app
+
+
 @tool
-async def call_rag_expert(task: str) -> str:
+async def call_rag_expert(task: str, config: RunnableConfig) -> str:
     """
     【内部知识库专家】
 
@@ -144,15 +341,43 @@ async def call_rag_expert(task: str) -> str:
     2. 查询未来的预测（如2025年的事情）。
     3. 闲聊。
     """
+    # 首次调用时创建依赖（已预热则直接返回）
+    rag_app = await registry.aget("rag")
+
+    if answer_cache is not None:
+        vec, cached = await answer_cache.aget(task)
+        if cached is not None:
+            stats = answer_cache.stats()
+            print(f"💾 语义答案缓存命中 (命中率 {stats['hit_rate']:.1%}，共 {stats['entries']} 条)")
+            return cached
+
+    question, retry_count = task, 0
+    if memo and mode != "multi_query":
+        # 同一问题之前走过改写链：直接从评审通过的那次（或最后一次）改写开始
+        resume = memo.resume_point(task, rag_tool.rag.index_version())
+        if resume is not None:
+            retry_count, question = resume
+            print(f"💾 改写链备忘命中: {task} -> {question} (跳到第 {retry_count} 次尝试)")
+
     inputs = {
         "messages": [HumanMessage(content=task)],
-        "question": task,
-        "retry_count": 0,
+        "question": question,
+        "origin": task,
+        "retry_count": retry_count,
         "documents": [],
+        "retrieved_ids": None,
+        "unchanged": False,
+        "queries": None,
+        "degraded": False,
     }
-    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    # 子图没有 checkpointer，只需传入截止时间，时间将尽时子图跳过改写和评审
+    config = with_deadline(get_deadline(config))
 
-    result = await app.ainvoke(inputs, config)
+    result = await rag_app.ainvoke(inputs, config)
 
     final_msg = result["messages"][-1]
+    # 只缓存基于检索资料生成的答案，找不到资料的回复不缓存；
+    # 时间将尽时降级生成的答案（跳过了评审或改写）不缓存，避免之后的请求一直拿到低质量答案
+    if answer_cache is not None and result.get("documents") and not result.get("degraded"):
+        await answer_cache.aput(task, final_msg.content, vec=vec)
     return final_msg.content
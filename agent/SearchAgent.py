@@ -1,17 +1,18 @@
+import asyncio
 import math
-import os
-import uuid
 from datetime import datetime
 from typing import TypedDict, List, Annotated
 
 import dotenv
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_core.messages import BaseMessage, ToolMessage, HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-from langchain_tavily import TavilySearch
 from langgraph.graph import add_messages, StateGraph
 
+from deadline import get_deadline, running_low, with_deadline
+from experts import get_llm, registry
+from tools.executor import ToolExecutor, deadline_config, tool_executor_config
+
 dotenv.load_dotenv()
 
 @tool
@@ -55,56 +56,48 @@ async def scrape_webpage(url: str) -> str:
     当你通过搜索获得了链接，但需要了解链接里的具体细节时，调用此工具。
     """
     try:
+        from langchain_community.document_loaders import WebBaseLoader
         loader = WebBaseLoader(url)
-        docs = loader.load()
+        # 同步抓取放到线程中执行，不阻塞事件循环，多个抓取才能真正并发
+        docs = await asyncio.to_thread(loader.load)
         content = "\n\n".join(doc.page_content for doc in docs)
         content = "\n".join(line.strip() for line in content.split("\n") if line.strip())
         return content[:3000]
     except Exception as e:
         return f"Error: {e}"
 
-tavily = TavilySearch(max_results=3)
-tools = [get_current_time, calculator, scrape_webpage, tavily]
-tools_by_name = {tool.name: tool for tool in tools}
-llm = ChatOpenAI(model=os.getenv("MODEL_NAME"))
-llm_with_tools = llm.bind_tools(tools)
+# 截止时间前留给最后一次 LLM 汇总作答的时间
+reserve = deadline_config.get("reserve_seconds", 10)
+
+# 搜索客户端和 LLM 客户端不在导入时创建，由 build() 在首次使用或预热时创建一次
+tools = None
+executor = None
+llm = None
+llm_with_tools = None
 
 
 class SearchState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
 
 # tools node
-async def tools_node(state: SearchState):
+async def tools_node(state: SearchState, config: RunnableConfig):
     last_msg = state["messages"][-1]
 
     if not last_msg.tool_calls:
         return {}
 
-    tool_msgs = []
-    for tool_call in last_msg.tool_calls:
-        name = tool_call["name"]
-
-        if name not in tools_by_name:
-            output = f"Error: Tool {name} not found"
-        else:
-            tool_func = tools_by_name[name]
-            tool_args = tool_call["args"]
-            try:
-                output = await tool_func.ainvoke(tool_args)
-            except Exception as e:
-                output = f"Error: {e}"
-
-        tool_msgs.append(
-            ToolMessage(
-                content=str(output),
-                tool_call_id=tool_call["id"]
-            )
-        )
-    return {"messages": tool_msgs}
+    # 同一步的多个工具调用（如搜索 + 多个网页抓取）并发执行
+    return {"messages": await executor.arun(last_msg.tool_calls, config)}
 
 # agent node
-async def agent_node(state: SearchState):
+async def agent_node(state: SearchState, config: RunnableConfig):
     messages = state["messages"]
+    if running_low(config, reserve):
+        # 时间将尽：不再调用工具，根据已搜索到的内容直接作答
+        print("⏱️ 剩余时间不足，停止搜索，直接作答")
+        hint = SystemMessage(content="时间有限，请根据目前已获得的信息直接回答，不要再调用工具。")
+        result = await llm.ainvoke([hint] + messages)
+        return {"messages": [result]}
     result = await llm_with_tools.ainvoke(messages)
     return {"messages": [result]}
 
@@ -125,8 +118,20 @@ def agent_continue(state: SearchState):
 graph.add_conditional_edges("agent", agent_continue)
 app = graph.compile()
 
+
+def build():
+    """创建搜索专家的依赖，返回子图；由专家注册表调用一次，不要在导入时调用"""
+    global tools, executor, llm, llm_with_tools
+    from langchain_tavily import TavilySearch
+    tavily = TavilySearch(max_results=3)
+    tools = [get_current_time, calculator, scrape_webpage, tavily]
+    executor = ToolExecutor(tools, reserve=reserve, **tool_executor_config.get("search_agent", {}))
+    llm = get_llm()
+    llm_with_tools = llm.bind_tools(tools)
+    return app
+
 @tool
-async def call_search_expert(task: str) -> str:
+async def call_search_expert(task: str, config: RunnableConfig) -> str:
     """
     【互联网搜索专家】
 
@@ -140,9 +145,13 @@ async def call_search_expert(task: str) -> str:
     - "明天北京天气怎么样？" -> 调用此工具。
     - "2024年奥运会金牌榜" -> 调用此工具。
     """
+    # 首次调用时创建依赖（已预热则直接返回）
+    search_app = await registry.aget("search")
+
     inputs = {"messages": [HumanMessage(content=task)]}
-    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    # 子图没有 checkpointer，只需传入截止时间
+    config = with_deadline(get_deadline(config))
 
-    result = await app.ainvoke(inputs, config)
+    result = await search_app.ainvoke(inputs, config)
 
     return result["messages"][-1].content
@@ -1,18 +1,30 @@
+import asyncio
+import json
 import os
+import time
+from bisect import bisect_right
+from contextlib import asynccontextmanager, nullcontext
+from functools import lru_cache
+from itertools import accumulate
 from typing import TypedDict, Annotated, Optional
 
 import dotenv
 import tiktoken
 from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_core.utils.json import parse_partial_json
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from psycopg_pool import AsyncConnectionPool
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph
 from langgraph.graph.message import add_messages
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 from RAGAgent import call_rag_expert
 from SearchAgent import call_search_expert
+from deadline import DEADLINE_KEY, make_deadline, running_low
+from experts import get_llm, registry
+from tools.executor import ToolExecutor, deadline_config, tool_executor_config
 
 dotenv.load_dotenv()
 
@@ -40,71 +52,157 @@ class Receipt(BaseModel):
     source: list[str] = Field(description="回答中引用的具体文档名称或页码列表。如果没用到文档，请留空。")
 
 
+RESPOND_TOOL = "respond"
+
+
+def make_respond_tool() -> dict:
+    """与专家工具一起绑定的 respond 工具，参数即 Receipt，调度中枢调用它直接给出最终结构化回答"""
+    respond_tool = convert_to_openai_tool(Receipt)
+    respond_tool["function"]["name"] = RESPOND_TOOL
+    respond_tool["function"]["description"] = (
+        "提交给用户的最终回答。不再需要调用其他工具时，调用此工具给出 reason、answer 和 source。"
+    )
+    return respond_tool
+
+
+@lru_cache(maxsize=1)
+def get_token_encoding() -> tiktoken.Encoding:
+    """消息计数用的 tiktoken 编码器，进程内只创建一次"""
+    return tiktoken.encoding_for_model("gpt-4o-mini")
+
+
+def count_message_tokens(msg: BaseMessage) -> int:
+    """消息的 token 数：正文加上工具调用参数（direct_response 模式的回答只在 respond 调用参数里，正文为空）"""
+    content = msg.content if isinstance(msg.content, str) else ""
+    tool_calls = getattr(msg, "tool_calls", None)
+    if tool_calls:
+        content += json.dumps([{"name": call["name"], "args": call["args"]} for call in tool_calls], ensure_ascii=False)
+    return len(get_token_encoding().encode(content))
+
+
+def merge_token_counts(left: Optional[dict], right: Optional[dict]) -> dict:
+    """token_counts 的 reducer：合并新计数，值为 None 表示该消息已删除"""
+    merged = dict(left or {})
+    for msg_id, count in (right or {}).items():
+        if count is None:
+            merged.pop(msg_id, None)
+        else:
+            merged[msg_id] = count
+    return merged
+
+
 class AgentState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
     summary: Optional[str]
     structured_answer: Optional[Receipt]
+    # 消息 id -> token 数，随 checkpoint 持久化，每条消息只计数一次
+    token_counts: Annotated[dict[str, int], merge_token_counts]
+    # 历史超出预算时，本轮起模型只看这条消息（含）之后的消息；更早的消息由后台摘要后删除
+    window_start: Optional[str]
+
+
+def window_messages(state: AgentState) -> list[BaseMessage]:
+    """模型实际使用的消息窗口：后台摘要完成前，跳过 window_start 之前待摘要的消息"""
+    messages = state["messages"]
+    window_start = state.get("window_start")
+    if window_start:
+        for i, msg in enumerate(messages):
+            if msg.id == window_start:
+                return messages[i:]
+    return messages
 
 
 class Agent:
-    def __init__(self, runnable, pool):
+    def __init__(self, runnable, pool, summarizer=None, default_timeout=None):
+        """
+        :param summarizer: 异步摘要函数 (待摘要消息, 现有摘要) -> 新摘要，在后台执行
+        :param default_timeout: 调用方没有指定时限时每轮对话的默认时限（秒），None 表示不限制
+        """
         self.runnable = runnable
         self.pool = pool
+        self.summarizer = summarizer
+        self.default_timeout = default_timeout
+        self._thread_locks: dict[str, list] = {}    # thread_id -> [锁, 引用数]
+        self._summarizing: set[str] = set()     # 正在后台摘要的 thread_id
+        self._background: set[asyncio.Task] = set()
 
     @classmethod
-    async def create(cls, max_tokens=5000):
+    async def create(cls, max_tokens=5000, direct_response=True, warmup=True):
+        """
+        :param max_tokens: 对话历史超过该 token 数时触发摘要
+        :param direct_response: 是否绑定 respond 工具，由调度中枢直接给出 Receipt，
+            省去 formatter 节点的额外 LLM 调用；未调用 respond 或参数解析失败时仍走 formatter
+        :param warmup: 是否在后台预先创建各专家（加载嵌入模型、打开 Chroma 等），不阻塞服务启动；
+            关闭时专家在首次调用时创建
+        """
         max_tokens = max_tokens
         tools = [call_rag_expert, call_search_expert]
-        tools_by_name = {tool.name: tool for tool in tools}
-        llm = ChatOpenAI(model=os.getenv("MODEL_NAME"))
-        llm_with_tools = llm.bind_tools(tools)
+        # 截止时间前留给 formatter 汇总作答的时间
+        reserve = deadline_config.get("reserve_seconds", 10)
+        # respond 由 respond 节点处理，与其他工具同时调用时直接提示模型稍后再提交
+        executor = ToolExecutor(
+            tools,
+            reserved={RESPOND_TOOL: "未提交：请在其他工具返回结果后再调用 respond"},
+            reserve=reserve,
+            **tool_executor_config.get("agent", {}),
+        )
+        llm = get_llm()
+        bound_tools = tools + [make_respond_tool()] if direct_response else tools
+        # 打上 orchestrator 标签，流式输出时据此只转发调度中枢的 token（不含子代理内部的 LLM 输出）
+        llm_with_tools = llm.bind_tools(bound_tools).with_config(tags=["orchestrator"])
         llm_structured = llm.with_structured_output(Receipt)
 
-        async def _structured_node(state: AgentState):
-            messages = state["messages"]
+        async def _structured_node(state: AgentState, config: RunnableConfig):
+            messages = window_messages(state)
             summary = state.get("summary", "")
 
             if summary:
                 prompt_msg = [SystemMessage(content=f"上下文摘要：{summary}")] + messages
             else:
                 prompt_msg = messages
+            if running_low(config, reserve):
+                prompt_msg = [SystemMessage(content="本轮时间有限，请根据目前已收集到的信息直接作答，信息不足时如实说明。")] + prompt_msg
 
             receipt = await llm_structured.ainvoke(prompt_msg)
             return {"structured_answer": receipt}
 
         async def _summary_node(state: AgentState):
-            """摘要逻辑节点"""
+            """
+            摘要检查节点：只做 token 计数和截断，不调用 LLM。
+            超出预算时记录窗口起点，本轮直接使用截断后的窗口，摘要在本轮结束后由后台任务完成
+            """
             messages = state['messages']
-            existing_summary = state.get("summary", "")
 
-            # 计算当前消息 token 数
-            encoding = tiktoken.encoding_for_model("gpt-4o-mini")
-            total_tokens = 0
-            for msg in messages:
-                content = msg.content if isinstance(msg.content, str) else ""
-                total_tokens += len(encoding.encode(content))
+            # 只对还没有计数的新消息编码，已有消息的 token 数从状态中读取
+            token_counts = state.get("token_counts") or {}
+            new_counts = {msg.id: count_message_tokens(msg) for msg in messages if msg.id not in token_counts}
+            counts = [token_counts.get(msg.id, new_counts.get(msg.id)) for msg in messages]
+            prefix = list(accumulate(counts))
+            total_tokens = prefix[-1] if prefix else 0
 
-            if total_tokens < max_tokens:
-                return {}
+            # 删减后的 token 满足限制：找到第一个 prefix[i] > total_tokens - max_tokens 的位置
+            cut_index = bisect_right(prefix, total_tokens - max_tokens) + 1
 
-            tokens = 0
-            cut_index = 0
-            for i, msg in enumerate(messages):
-                content = msg.content if isinstance(msg.content, str) else ""
-                tokens += len(encoding.encode(content))
-                # 删减后的 token 满足限制
-                if total_tokens - tokens < max_tokens:
-                    cut_index = i + 1
-                    break
+            # 窗口不能以 ToolMessage 开头：一步可能有多个并发工具调用，跳过所有连续的 ToolMessage，
+            # 否则其 tool_calls 所在的 AIMessage 被截掉，API 会拒绝请求
+            while cut_index < len(messages) and isinstance(messages[cut_index], ToolMessage):
+                cut_index += 1
 
-            if cut_index < len(messages):
-                first_kept_msg = messages[cut_index]
-                if isinstance(first_kept_msg, ToolMessage):
-                    cut_index += 1
+            # 至少保留最新一条消息
+            cut_index = min(cut_index, len(messages) - 1)
 
-            summary_msg = messages[:cut_index]
-            delete_msg = [RemoveMessage(id=msg.id) for msg in summary_msg]
+            if total_tokens < max_tokens or cut_index <= 0:
+                update = {"token_counts": new_counts} if new_counts else {}
+                if state.get("window_start"):
+                    update["window_start"] = None
+                return update
+
+            return {
+                "token_counts": new_counts,
+                "window_start": messages[cut_index].id,
+            }
 
+        async def _summarize(summary_msg: list[BaseMessage], existing_summary: str) -> str:
             summary_prompt = (
                 "请将上面的对话内容总结为一个摘要。"
                 f"现有的摘要：{existing_summary}"
@@ -112,15 +210,15 @@ class Agent:
             summary_message = await llm.ainvoke(
                 summary_msg + [HumanMessage(content=summary_prompt)],
                 )
-            new_summary = summary_message.content
+            return summary_message.content
 
-            return {
-                "messages": delete_msg,
-                "summary": new_summary,
-            }
+        async def _agent_node(state: AgentState, config: RunnableConfig):
+            if running_low(config, reserve):
+                # 时间将尽：不再规划和调用工具，由 formatter 用已收集的信息作答
+                print("⏱️ 剩余时间不足，跳过调度，直接汇总作答")
+                return {}
 
-        async def _agent_node(state: AgentState):
-            messages = state["messages"]
+            messages = window_messages(state)
             summary = state.get("summary", "")
 
             system_prompt = """你是一个高智能对话系统的**任务调度与决策中枢 (Central Orchestrator)**。
@@ -155,6 +253,11 @@ class Agent:
             2. **严禁偷懒**：不要因为是 JSON 格式就省略内容。
 
             请保持客观、冷静、服务型的对话风格。"""
+            if direct_response:
+                system_prompt += f"""
+
+            【提交回答】
+            不再需要调用其他工具时，调用 `{RESPOND_TOOL}` 工具提交最终回答（reason、answer、source），不要再直接输出文本。"""
             system_msg = [SystemMessage(content=system_prompt)]
 
             if summary:
@@ -165,44 +268,58 @@ class Agent:
             result = await llm_with_tools.ainvoke(messages)
             return {"messages": [result]}
 
-        async def _tool_node(state: AgentState):
+        async def _tool_node(state: AgentState, config: RunnableConfig):
             last_msg = state["messages"][-1]
 
             if not last_msg.tool_calls:
                 return {}
 
-            tool_msgs = []
-            for tool_call in last_msg.tool_calls:
-                name = tool_call["name"]
-                if name not in tools_by_name:
-                    output = f"Error: 调用不存在的工具"
-                else:
-                    try:
-                        tool_func = tools_by_name[name]
-                        args = tool_call["args"]
-                        output = await tool_func.ainvoke(args)
-                    except Exception as e:
-                        output = f"Error: {e}"
-                tool_msgs.append(
-                    ToolMessage(
-                        content=str(output),
-                        tool_call_id=tool_call["id"]
-                    )
-                )
-            return {"messages": tool_msgs}
+            return {"messages": await executor.arun(last_msg.tool_calls, config)}
 
         graph = StateGraph(AgentState)
         graph.add_node("summary", _summary_node)
         graph.add_node("agent", _agent_node)
         graph.add_node("tools", _tool_node)
         graph.add_node("formatter", _structured_node)
+
+        async def _respond_node(state: AgentState):
+            """解析 respond 工具调用的参数作为最终回答，解析失败时交给 formatter"""
+            tool_calls = state["messages"][-1].tool_calls
+            # 每个工具调用都要有对应的 ToolMessage，多次调用 respond 时只采用第一个
+            skipped = [ToolMessage(content="已忽略", tool_call_id=call["id"]) for call in tool_calls[1:]]
+            try:
+                receipt = Receipt.model_validate(tool_calls[0]["args"])
+            except ValidationError as e:
+                print(f"⚠️ respond 参数解析失败，改用 formatter 生成结构化回答: {e}")
+                return {
+                    "structured_answer": None,
+                    "messages": [ToolMessage(content=f"Error: {e}", tool_call_id=tool_calls[0]["id"])] + skipped,
+                }
+            return {
+                "structured_answer": receipt,
+                "messages": [ToolMessage(content="已提交回答", tool_call_id=tool_calls[0]["id"])] + skipped,
+            }
+
+        def respond_continue(state: AgentState):
+            if state.get("structured_answer") is None:
+                return "formatter"
+            return "__end__"
+
+        if direct_response:
+            graph.add_node("respond", _respond_node)
+            graph.add_conditional_edges("respond", respond_continue)
         graph.set_entry_point("summary")
         graph.add_edge("summary", "agent")
         graph.add_edge("tools", "agent")
 
         def agent_continue(state: AgentState):
             last_msg = state["messages"][-1]
-            if last_msg.tool_calls:
+            # 时间将尽时 agent 节点不产出消息，最后一条可能是用户消息或工具结果
+            tool_calls = getattr(last_msg, "tool_calls", None)
+            if direct_response and tool_calls \
+                    and all(call["name"] == RESPOND_TOOL for call in tool_calls):
+                return "respond"
+            if tool_calls:
                 return "tools"
             else:
                 return "formatter"
@@ -233,20 +350,102 @@ class Agent:
         await checkpointer.setup()  # 第一次运行时，需要创建表结构
 
         compiled_graph = graph.compile(checkpointer=checkpointer)
-        return cls(compiled_graph, pool)
-
-    async def ainvoke(self, query: str, thread_id: str = None):
+        agent = cls(compiled_graph, pool, summarizer=_summarize, default_timeout=deadline_config.get("default_timeout"))
+        if warmup:
+            agent._spawn(agent._warmup())
+        return agent
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """创建后台任务，aclose 时等待其完成"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _warmup(self):
+        start = time.perf_counter()
+        timings = await registry.warmup()
+        detail = "，".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+        print(f"🔥 专家预热完成，总耗时 {time.perf_counter() - start:.2f}s（{detail}）")
+
+    @asynccontextmanager
+    async def _thread_lock(self, thread_id: str):
+        """同一 thread_id 的对话轮次与后台摘要写回互斥，避免互相覆盖 checkpoint"""
+        entry = self._thread_locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._thread_locks[thread_id]
+
+    def _schedule_summary(self, thread_id: str, final_state: dict):
+        """本轮结束后，如有待摘要的消息，在后台摘要；同一 thread_id 同时只有一个摘要任务"""
+        if not thread_id or not final_state or not final_state.get("window_start") or self.summarizer is None:
+            return
+        if thread_id in self._summarizing:
+            return
+        self._summarizing.add(thread_id)
+        self._spawn(self._summarize_thread(thread_id))
+
+    async def _summarize_thread(self, thread_id: str):
+        config = {"configurable": {"thread_id": thread_id}}
+        try:
+            snapshot = await self.runnable.aget_state(config)
+            state = snapshot.values
+            window = window_messages(state)
+            summary_msg = state["messages"][:len(state["messages"]) - len(window)]
+            if not summary_msg:
+                return
+            new_summary = await self.summarizer(summary_msg, state.get("summary", ""))
+
+            async with self._thread_lock(thread_id):
+                # 摘要期间可能又进行了新的对话轮次，只删除仍存在的消息；新轮次只会追加消息，不影响待删除的前缀
+                snapshot = await self.runnable.aget_state(config)
+                current_ids = {msg.id for msg in snapshot.values["messages"]}
+                removed = [msg for msg in summary_msg if msg.id in current_ids]
+                update = {
+                    "messages": [RemoveMessage(id=msg.id) for msg in removed],
+                    "summary": new_summary,
+                    "token_counts": {msg.id: None for msg in removed},
+                }
+                if snapshot.values.get("window_start") == state.get("window_start"):
+                    update["window_start"] = None
+                # 以 formatter 身份写入，写入后图处于结束状态
+                await self.runnable.aupdate_state(config, update, as_node="formatter")
+            print(f"📝 后台摘要完成 thread_id={thread_id}，压缩 {len(removed)} 条消息")
+        except Exception as e:
+            print(f"⚠️ 后台摘要失败 thread_id={thread_id}: {e}")
+        finally:
+            self._summarizing.discard(thread_id)
+
+    def _run_config(self, thread_id: Optional[str], timeout: Optional[float]) -> Optional[RunnableConfig]:
+        """本轮的 config：会话 ID 和截止时间，截止时间随 config 传入各节点、工具和子图"""
+        configurable = {}
+        if thread_id:
+            configurable["thread_id"] = thread_id
+        deadline = make_deadline(timeout if timeout is not None else self.default_timeout)
+        if deadline is not None:
+            configurable[DEADLINE_KEY] = deadline
+        return {"configurable": configurable} if configurable else None
+
+    async def ainvoke(self, query: str, thread_id: str = None, timeout: float = None):
         """
         封装后的调用接口
         :param query: 用户的纯文本问题
         :param thread_id: 会话 ID，用于记忆隔离
+        :param timeout: 本轮时限（秒），不传则使用 default_timeout；时间将尽时用已收集的信息作答
         :return: 最终的结构化结果 (Receipt 对象) 或 错误信息
         """
         inputs = {"messages": [HumanMessage(content=query)]}
-        config = {"configurable": {"thread_id": thread_id}} if thread_id else None
+        config = self._run_config(thread_id, timeout)
 
         # 执行图
-        final_state = await self.runnable.ainvoke(inputs, config=config)
+        async with self._thread_lock(thread_id) if thread_id else nullcontext():
+            final_state = await self.runnable.ainvoke(inputs, config=config)
+        self._schedule_summary(thread_id, final_state)
 
         # 优先返回结构化答案，如果没有（比如出错了），返回最后一条文本消息
         if final_state.get("structured_answer"):
@@ -254,5 +453,114 @@ class Agent:
         else:
             return final_state["messages"][-1].content
 
+    async def astream(self, query: str, thread_id: str = None, include_events: bool = False, timeout: float = None):
+        """
+        流式调用接口：通过 astream_events 产出调度中枢生成的回答，最后产出结构化结果
+        - 普通回答按步缓存，确认该步没有工具调用后整段产出；direct_response 模式下 respond 的 answer 逐块产出
+        :param query: 用户的纯文本问题
+        :param thread_id: 会话 ID，用于记忆隔离
+        :param include_events: 是否同时产出中间事件（节点开始/结束、工具调用、检索完成）
+        :param timeout: 本轮时限（秒），不传则使用 default_timeout
+        :return: 异步生成器，产出 ("token", 增量文本)、("event", 事件字典)（仅 include_events 时），
+            最后产出 ("final", Receipt 对象 或 错误信息)；final 之前至少产出一个 token
+        """
+        inputs = {"messages": [HumanMessage(content=query)]}
+        config = self._run_config(thread_id, timeout)
+
+        final_state = None
+        streamed = False
+        # respond 工具调用的参数是逐块生成的 JSON：(run_id, index) -> [工具名, 已收到的参数, 已产出的 answer]
+        respond_calls: dict[tuple, list] = {}
+        # 每一步调度的正文先缓存：同一步带有工具调用时正文只是过渡语（"我来查一下"），不是回答
+        pending: dict[str, list[str]] = {}
+        tool_steps: set[str] = set()
+        async with self._thread_lock(thread_id) if thread_id else nullcontext():
+            async for event in self.runnable.astream_events(inputs, config=config, version="v2"):
+                kind = event["event"]
+                is_orchestrator = "orchestrator" in event.get("tags", [])
+                if kind == "on_chat_model_stream" and is_orchestrator:
+                    run_id = event["run_id"]
+                    chunk = event["data"]["chunk"]
+                    if getattr(chunk, "tool_call_chunks", None):
+                        tool_steps.add(run_id)
+                        pending.pop(run_id, None)
+                    content = chunk.content
+                    if isinstance(content, str) and content and run_id not in tool_steps:
+                        pending.setdefault(run_id, []).append(content)
+                    # direct_response 模式下回答写在 respond 的参数里，解析不完整的 JSON 转发 answer 的增量
+                    for delta in self._respond_answer_deltas(run_id, chunk, respond_calls):
+                        streamed = True
+                        yield "token", delta
+                elif kind == "on_chat_model_end" and is_orchestrator:
+                    # 这一步结束且没有工具调用，缓存的正文就是回答
+                    content = "".join(pending.pop(event["run_id"], []))
+                    output = event["data"].get("output")
+                    if content and event["run_id"] not in tool_steps and not getattr(output, "tool_calls", None):
+                        streamed = True
+                        yield "token", content
+                elif include_events and (payload := self._event_payload(event)) is not None:
+                    yield "event", payload
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # 根节点（整张图）结束事件携带最终状态
+                    final_state = event["data"].get("output")
+        self._schedule_summary(thread_id, final_state)
+
+        if final_state and final_state.get("structured_answer"):
+            receipt = final_state["structured_answer"]
+            if not streamed and receipt.answer:
+                # 回答由 formatter 生成（没有流式 token）时，先把完整回答作为一个 token 发出
+                yield "token", receipt.answer
+            yield "final", receipt
+        elif final_state and final_state.get("messages"):
+            yield "final", final_state["messages"][-1].content
+        else:
+            yield "final", ""
+
+    @staticmethod
+    def _respond_answer_deltas(run_id: str, chunk, respond_calls: dict[tuple, list]) -> list[str]:
+        """累积 respond 工具调用的参数块，返回 answer 字段新增的文本"""
+        deltas = []
+        for call_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+            key = (run_id, call_chunk.get("index"))
+            state = respond_calls.setdefault(key, [None, "", ""])
+            if call_chunk.get("name"):
+                state[0] = call_chunk["name"]
+            state[1] += call_chunk.get("args") or ""
+            if state[0] != RESPOND_TOOL:
+                continue
+            try:
+                answer = (parse_partial_json(state[1]) or {}).get("answer")
+            except Exception:
+                continue
+            # 截断在转义序列中间时解析结果可能变短，等下一块再产出
+            if isinstance(answer, str) and len(answer) > len(state[2]) and answer.startswith(state[2]):
+                deltas.append(answer[len(state[2]):])
+                state[2] = answer
+        return deltas
+
+    @staticmethod
+    def _event_payload(event) -> Optional[dict]:
+        """把 astream_events 事件转换为对外的中间事件，无关事件返回 None"""
+        kind = event["event"]
+        # 只报告主图的直接子节点，子代理内部的节点不报告
+        if kind in ("on_chain_start", "on_chain_end") and len(event.get("parent_ids", [])) == 1 \
+                and event.get("metadata", {}).get("langgraph_node") == event["name"]:
+            return {"type": "node_start" if kind == "on_chain_start" else "node_end", "node": event["name"]}
+        if kind == "on_tool_start":
+            return {"type": "tool_start", "name": event["name"], "input": event["data"].get("input")}
+        if kind == "on_tool_end":
+            return {"type": "tool_end", "name": event["name"]}
+        if kind == "on_retriever_end":
+            docs = event["data"].get("output") or []
+            return {
+                "type": "retrieval",
+                "documents": len(docs),
+                "sources": list(dict.fromkeys(d.metadata.get("source", "") for d in docs)),
+            }
+        return None
+
     async def aclose(self):
+        # 等待后台摘要写回（以及预热）完成后再关闭连接池
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
         await self.pool.close()
@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from cachembedding import CacheEmbedding
+
+
+class SemanticAnswerCache:
+    """
+    语义答案缓存：按问题向量查找已回答过的相似问题，相似度超过阈值直接返回缓存的答案
+    - 问题向量来自 CacheEmbedding，保存在一个小的 numpy 矩阵里，查询时一次矩阵乘法
+    - 条目超过 ttl_seconds 失效；version_fn 返回的索引版本变化（知识库重建）时清空全部条目
+    """
+    def __init__(
+        self,
+        embedding: CacheEmbedding,
+        similarity_threshold=0.95,
+        ttl_seconds=3600,
+        max_entries=5000,
+        version_fn: Optional[Callable[[], object]] = None,
+    ):
+        """
+        :param embedding: 问题编码模型
+        :param similarity_threshold: 余弦相似度 >= 该值视为同一问题
+        :param ttl_seconds: 条目有效期（秒），None 表示不过期
+        :param max_entries: 最大条目数，满了先清理过期条目，再淘汰最早写入的
+        :param version_fn: 返回知识库索引版本，版本变化时缓存整体失效
+        """
+        self.embedding = embedding
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self._lock = threading.Lock()
+        self._version = version_fn() if version_fn else None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._reset()
+
+    def _reset(self):
+        self._vectors = None            # (容量, 维度) 预分配矩阵，前 _count 行有效
+        self._created = np.empty(0, dtype=np.float64)
+        self._answers: list[str] = []
+        self._count = 0
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            if self._count:
+                print("♻️ 知识库索引已更新，清空语义答案缓存")
+                self.invalidations += 1
+            self._version = version
+            self._reset()
+
+    def _alive(self, now: float) -> np.ndarray:
+        created = self._created[:self._count]
+        if self.ttl_seconds is None:
+            return np.ones(self._count, dtype=bool)
+        return now - created < self.ttl_seconds
+
+    def _compact(self, keep: np.ndarray):
+        idx = np.flatnonzero(keep)
+        self._vectors[:len(idx)] = self._vectors[idx]
+        self._created[:len(idx)] = self._created[idx]
+        self._answers = [self._answers[i] for i in idx]
+        self._count = len(idx)
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def lookup(self, vec) -> Optional[str]:
+        vec = self._normalize(vec)
+        with self._lock:
+            self._check_version()
+            if self._count:
+                sims = self._vectors[:self._count] @ vec
+                sims[~self._alive(time.time())] = -1.0
+                best = int(np.argmax(sims))
+                if sims[best] >= self.similarity_threshold:
+                    self.hits += 1
+                    return self._answers[best]
+            self.misses += 1
+            return None
+
+    def store(self, vec, answer: str):
+        vec = self._normalize(vec)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            if self._vectors is None:
+                capacity = min(self.max_entries, 256)
+                self._vectors = np.empty((capacity, len(vec)), dtype=np.float32)
+                self._created = np.empty(capacity, dtype=np.float64)
+            if self._count >= self.max_entries:
+                keep = self._alive(now)
+                if keep.all():
+                    keep[0] = False     # 没有过期条目，淘汰最早写入的
+                self._compact(keep)
+            if self._count == len(self._vectors):
+                capacity = min(self.max_entries, len(self._vectors) * 2)
+                grown = np.empty((capacity, self._vectors.shape[1]), dtype=np.float32)
+                grown[:self._count] = self._vectors[:self._count]
+                created = np.empty(capacity, dtype=np.float64)
+                created[:self._count] = self._created[:self._count]
+                self._vectors, self._created = grown, created
+            self._vectors[self._count] = vec
+            self._created[self._count] = now
+            self._answers.append(answer)
+            self._count += 1
+
+    async def aget(self, question: str):
+        """返回 (问题向量, 缓存答案或 None)，向量可直接传给 aput 复用"""
+        vec = await self.embedding.aembed_query(question)
+        return vec, self.lookup(vec)
+
+    async def aput(self, question: str, answer: str, vec=None):
+        if vec is None:
+            vec = await self.embedding.aembed_query(question)
+        self.store(vec, answer)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": self._count,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+            }
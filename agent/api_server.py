@@ -1,4 +1,6 @@
 import asyncio
+import json
+import uuid
 
 import os
 os.environ["USER_AGENT"] = "my-agent-server/1.0"
@@ -6,19 +8,27 @@ os.environ["USER_AGENT"] = "my-agent-server/1.0"
 import uvicorn
 from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from langserve import add_routes
 from langchain_core.messages import HumanMessage
-from langchain_core.runnables import RunnableLambda
-from typing import List, Any
-from typing_extensions import TypedDict
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from sse_starlette.sse import EventSourceResponse
+from typing import List, Any, Optional
+from typing_extensions import NotRequired, TypedDict
 
 from agent import Agent, Receipt
 
 class ChatRequest(BaseModel):
     query: str = Field(description="用户提问的内容")
-    thread_id: str = Field(description="会话ID，用于区分不同用户", default="default_thread")
+    thread_id: str = Field(
+        description="会话ID，用于区分不同用户；不传则每次请求使用新会话",
+        default_factory=lambda: str(uuid.uuid4()),
+    )
+    timeout: Optional[float] = Field(
+        description="本轮时限（秒），时间将尽时用已收集的信息作答；不传则使用配置的默认时限",
+        default=None,
+    )
 
 # 生命周期管理（Lifespan）
 # FastAPI 的核心特性：在服务器启动前建立连接，关闭后释放连接
@@ -51,12 +61,27 @@ async def redirect_root():
 
 # 接口 A: 简单直观的自定义接口 (供前端 App/小程序调用)
 # URL: POST http://localhost:8000/chat
+# 客户端断开时取消整个图的执行
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
-    response = await agent_instance.ainvoke(
+async def chat_endpoint(request: ChatRequest, http_request: Request):
+    task = asyncio.create_task(agent_instance.ainvoke(
         query=request.query,
         thread_id=request.thread_id,
-    )
+        timeout=request.timeout,
+    ))
+    try:
+        while True:
+            done, _ = await asyncio.wait([task], timeout=0.5)
+            if done:
+                break
+            if await http_request.is_disconnected():
+                print(f"🔌 客户端已断开，取消请求 thread_id={request.thread_id}")
+                task.cancel()
+                return {"answer": None}
+    finally:
+        if not task.done():
+            task.cancel()
+    response = task.result()
 
     if type(response) == Receipt:
         return {
@@ -66,21 +91,61 @@ async def chat_endpoint(request: ChatRequest):
         }
     return {"answer": response}
 
+# 接口 A2: SSE 流式接口
+# URL: POST http://localhost:8000/chat/stream
+# 事件: node_start / node_end / tool_start / tool_end / retrieval（JSON），token（增量文本），final（Receipt JSON）
+# 客户端断开时取消整个图的执行，不再继续消耗 LLM 调用
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    async def event_generator():
+        stream = agent_instance.astream(
+            query=request.query,
+            thread_id=request.thread_id,
+            include_events=True,
+            timeout=request.timeout,
+        )
+        try:
+            async for kind, payload in stream:
+                if await http_request.is_disconnected():
+                    print(f"🔌 客户端已断开，取消请求 thread_id={request.thread_id}")
+                    break
+                if kind == "token":
+                    yield {"event": "token", "data": payload}
+                elif kind == "event":
+                    yield {"event": payload["type"], "data": json.dumps(payload, ensure_ascii=False, default=str)}
+                elif type(payload) == Receipt:
+                    data = {"reason": payload.reason, "answer": payload.answer, "source": payload.source}
+                    yield {"event": "final", "data": json.dumps(data, ensure_ascii=False)}
+                else:
+                    yield {"event": "final", "data": json.dumps({"answer": payload}, ensure_ascii=False)}
+        except asyncio.CancelledError:
+            print(f"🔌 客户端已断开，取消请求 thread_id={request.thread_id}")
+            raise
+        finally:
+            await stream.aclose()
+
+    return EventSourceResponse(event_generator())
+
 class AgentInput(TypedDict):
     query: str
+    thread_id: NotRequired[str]
 
 # 接口 B: LangServe 标准接口 (供调试、LangSmith 或高级流式前端调用)
 # URL: http://localhost:8000/agent/playground
 # 注意：这里通过一个 wrapper 函数来暴露 Agent 的能力
-async def langserve_wrapper(inputs: AgentInput):
+async def langserve_wrapper(inputs: AgentInput, config: RunnableConfig):
     # LangServe 传进来的 inputs 通常是 {"messages": [...]}
     # 我们提取最后一条消息作为 query
     query = inputs["query"]
-    # 这里为了简单，暂时写死 thread_id，或者从 config 获取
-    # 实际生产中 LangServe 会通过 configurable 传递 thread_id
+    # thread_id 优先取 config 的 configurable，其次取 inputs，都没有则使用新会话
+    thread_id = (
+        config.get("configurable", {}).get("thread_id")
+        or inputs.get("thread_id")
+        or str(uuid.uuid4())
+    )
     return await agent_instance.ainvoke(
         query=query,
-        thread_id="default_thread",
+        thread_id=thread_id,
 )
 
 langserve_runnable = RunnableLambda(langserve_wrapper)
@@ -0,0 +1,108 @@
+import math
+import os
+import pickle
+import re
+from collections import Counter, defaultdict
+
+import jieba
+import numpy as np
+
+_PUNCT = re.compile(r"[\W_]+")
+
+
+class BM25Index:
+    """
+    持久化 BM25 倒排索引（jieba 中文分词），与 Chroma 集合按段 id 对齐
+    - sync() 只对新增的段分词，删除集合中已不存在的段
+    - 倒排表中预先算好每个 (词, 段) 的 BM25 权重，查询时只需累加命中词的倒排表
+    """
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms: dict[str, dict[str, int]] = {}  # 段 id -> 词频
+        self._ids: list[str] = []
+        self._postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    @staticmethod
+    def tokenize(text: str) -> list[str]:
+        return [t.lower() for t in jieba.lcut_for_search(text) if t.strip() and not _PUNCT.fullmatch(t)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def sync(self, db, batch_size=1000):
+        """与 Chroma 集合同步，返回 (新增段数, 删除段数)"""
+        ids = set(db.get(include=[])["ids"])
+        removed = set(self.doc_terms) - ids
+        for _id in removed:
+            del self.doc_terms[_id]
+
+        new_ids = [_id for _id in ids if _id not in self.doc_terms]
+        for i in range(0, len(new_ids), batch_size):
+            got = db.get(ids=new_ids[i:i + batch_size], include=["documents"])
+            for _id, text in zip(got["ids"], got["documents"]):
+                self.doc_terms[_id] = dict(Counter(self.tokenize(text or "")))
+
+        self._finalize()
+        return len(new_ids), len(removed)
+
+    def _finalize(self):
+        """根据词频重建倒排表和 BM25 权重"""
+        self._ids = list(self.doc_terms)
+        n = len(self._ids)
+        if not n:
+            self._postings = {}
+            return
+        doc_len = np.array([sum(terms.values()) for terms in self.doc_terms.values()], dtype=np.float32)
+        avgdl = max(float(doc_len.mean()), 1.0)
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avgdl)
+
+        postings = defaultdict(lambda: ([], []))
+        for idx, terms in enumerate(self.doc_terms.values()):
+            for term, tf in terms.items():
+                docs, tfs = postings[term]
+                docs.append(idx)
+                tfs.append(tf)
+
+        self._postings = {}
+        for term, (docs, tfs) in postings.items():
+            docs = np.asarray(docs, dtype=np.int32)
+            tfs = np.asarray(tfs, dtype=np.float32)
+            idf = math.log((n - len(docs) + 0.5) / (len(docs) + 0.5) + 1)
+            weights = idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+            self._postings[term] = (docs, weights.astype(np.float32))
+
+    def search(self, query: str, k=20) -> list[tuple[str, float]]:
+        """返回得分最高的 k 个 (段 id, 得分)，只包含至少命中一个词的段"""
+        if not self._ids:
+            return []
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        for term in set(self.tokenize(query)):
+            hit = self._postings.get(term)
+            if hit is not None:
+                scores[hit[0]] += hit[1]
+        hits = np.flatnonzero(scores > 0)
+        if not len(hits):
+            return []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return [(self._ids[i], float(scores[i])) for i in top]
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {"k1": self.k1, "b": self.b, "doc_terms": self.doc_terms, "ids": self._ids, "postings": self._postings},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_terms = data["doc_terms"]
+        index._ids = data["ids"]
+        index._postings = data["postings"]
+        return index
@@ -1,23 +1,93 @@
+import asyncio
 import hashlib
-import json
 import os
-from functools import lru_cache
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import dotenv
 # import torch
 from langchain_core.embeddings import Embeddings
+import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from embeddingstore import JsonEmbeddingStore, MmapEmbeddingStore
+from memorycache import MemoryCache
+
 dotenv.load_dotenv()
 
 
+class _QueryCoalescer:
+    """把短时间窗口内并发到达的查询合并成一次批量编码（micro-batching）"""
+    def __init__(self, encode, executor, wait_ms=5, max_batch=128):
+        self.encode = encode
+        self.executor = executor
+        self.wait_ms = wait_ms
+        self.max_batch = max_batch
+        self._loop = None
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._handle = None
+        self._tasks = set()
+
+    async def submit(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 事件循环变化（如多次 asyncio.run），丢弃旧循环上的状态
+            self._loop, self._pending, self._handle = loop, [], None
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._handle is None:
+            self._handle = loop.call_later(self.wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = await self._loop.run_in_executor(self.executor, self.encode, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+
 class CacheEmbedding(Embeddings):
     """包装原始 embedding 模型，实现缓存 + 并行逻辑"""
     def __init__(
         self,
         cache_path,
         batch_size=128,
+        backend="json",
+        memory_max_entries=50000,
+        memory_max_bytes=None,
+        memory_policy="lru",
+        coalesce_ms=5,
     ):
+        """
+        :param cache_path: 缓存文件路径
+        :param batch_size: 模型单次编码的批大小
+        :param backend: 持久化缓存后端，"json" 或 "mmap"（二进制追加写入，可自动迁移旧 JSON 缓存）
+        :param memory_max_entries: 内存缓存最大条目数，None 表示不限
+        :param memory_max_bytes: 内存缓存最大字节数，None 表示不限
+        :param memory_policy: 内存缓存淘汰策略，"lru" 或 "tinylfu"
+        :param coalesce_ms: 异步查询的合批等待时间（毫秒），窗口内的并发查询合并为一次模型调用
+        """
         self.cache_path = cache_path
         self.batch_size = batch_size
         self.embeddings = HuggingFaceEmbeddings(
@@ -27,62 +97,119 @@ class CacheEmbedding(Embeddings):
         )
 
         os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
-        self.cache = self._load_cache()
-
-    def _load_cache(self):
-        if os.path.exists(self.cache_path):
-            try:
-                with open(self.cache_path, "r", encoding="utf-8") as f:
-                    data = f.read().strip()
-                    if not data:
-                        return {}
-                    return json.loads(data)
-            except json.JSONDecodeError:
-                print(f"⚠️ 缓存文件损坏 ({self.cache_path})，已重置为空缓存。")
-                return {}
-            except Exception as e:
-                print(f"⚠️ 加载缓存时出现错误: {e}")
-                return {}
-        return {}
-
-    def _save_cache(self):
-        with open(self.cache_path, "w", encoding="utf-8") as f:
-            json.dump(self.cache, f)
+        self.cache = self._open_store(backend)
+        # 持久化缓存前的内存层，容量有界，供长时间运行的服务进程使用
+        self.memory = MemoryCache(
+            max_entries=memory_max_entries,
+            max_bytes=memory_max_bytes,
+            policy=memory_policy,
+        )
+        # 模型调用放到专用线程执行，不阻塞事件循环；CPU 推理串行执行避免线程争抢
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._coalescer = _QueryCoalescer(
+            self._encode,
+            self._executor,
+            wait_ms=coalesce_ms,
+            max_batch=self.batch_size,
+        )
+
+    def _open_store(self, backend):
+        if backend == "json":
+            return JsonEmbeddingStore(self.cache_path)
+        if backend == "mmap":
+            base_path, ext = os.path.splitext(self.cache_path)
+            legacy_path = self.cache_path if ext == ".json" else None
+            return MmapEmbeddingStore(base_path, legacy_json_path=legacy_path)
+        raise ValueError(f"不支持的缓存后端: {backend}")
 
     @staticmethod
     def _text_hash(text: str) -> str:
         """对文本生成唯一哈希"""
         return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    @lru_cache(maxsize=None)
+    def _lookup(self, _hash: str):
+        """先查内存缓存，未命中再查持久化缓存并回填内存"""
+        vec = self.memory.get(_hash)
+        if vec is not None:
+            return vec
+        vec = self.cache.get(_hash)
+        if vec is not None:
+            self.memory.put(_hash, vec)
+        return vec
+
+    def _lookup_many(self, hashes: list[str]) -> dict:
+        """批量版 _lookup，返回命中的 {hash: 向量}"""
+        found = {}
+        for _hash in hashes:
+            vec = self.memory.get(_hash)
+            if vec is not None:
+                found[_hash] = vec
+        rest = [h for h in hashes if h not in found]
+        if rest:
+            stored = self.cache.get_many(rest)
+            for _hash, vec in stored.items():
+                self.memory.put(_hash, vec)
+            found.update(stored)
+        return found
+
+    def _remember(self, computed: dict):
+        """新计算的向量同时写入持久化缓存和内存缓存"""
+        self.cache.add(computed)
+        for _hash, vec in computed.items():
+            self.memory.put(_hash, vec)
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        """直接调用模型编码并写入缓存（调用方保证 texts 均未命中缓存）"""
+        with self._model_lock:
+            vectors = self.embeddings.embed_documents(texts)
+        self._remember({self._text_hash(t): v for t, v in zip(texts, vectors)})
+        return vectors
+
+    def cache_stats(self) -> dict:
+        """内存缓存命中/未命中/淘汰计数，以及持久化缓存条目数"""
+        return {**self.memory.stats(), "persistent_entries": len(self.cache)}
+
     def embed_query(self, text: str) -> list[float]:
         """单句嵌入"""
         _hash = self._text_hash(text)
-        if _hash in self.cache:
-            return self.cache[_hash]
-        vec = self.embeddings.embed_query(text)
-        self.cache[_hash] = vec
-        self._save_cache()
+        vec = self._lookup(_hash)
+        if vec is not None:
+            return vec.tolist()
+        with self._model_lock:
+            vec = self.embeddings.embed_query(text)
+        self._remember({_hash: vec})
         return vec
 
-    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
-        """批量嵌入"""
-        results, to_compute = [], []
-        for text in texts:
-            _hash = self._text_hash(text)
-            if _hash in self.cache:
-                results.append(self.cache[_hash])
-            else:
-                to_compute.append(text)
-
-        if to_compute is not None:
-            vectors = self.embeddings.embed_documents(to_compute)
-            for t, v in zip(to_compute, vectors):
-                _hash = self._text_hash(t)
-                self.cache[_hash] = v
-                results.append(v)
-            self._save_cache()
-        return results
+    async def aembed_query(self, text: str) -> list[float]:
+        """异步单句嵌入：命中缓存直接返回，否则与其他并发查询合批后在专用线程编码"""
+        vec = self._lookup(self._text_hash(text))
+        if vec is not None:
+            return vec.tolist()
+        return await self._coalescer.submit(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """异步批量嵌入，在专用线程中执行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_documents, texts)
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        """
+        批量嵌入，返回与 texts 顺序一致的 (len(texts), dim) float32 矩阵
+        - 每条文本只计算一次哈希，批内相同文本只编码一次
+        - 只把未命中的文本交给模型，且只调用一次
+        - 全部命中时不调用模型，也不写缓存
+        """
+        hashes = [self._text_hash(t) for t in texts]
+        unique = dict(zip(hashes, texts))   # hash -> 文本，批内去重
+
+        vectors = self._lookup_many(list(unique))
+        misses = [h for h in unique if h not in vectors]
+        if misses:
+            encoded = self._encode([unique[h] for h in misses])
+            vectors.update(zip(misses, np.asarray(encoded, dtype=np.float32)))
+
+        return np.stack([vectors[h] for h in hashes])
 
     # def embed_documents(self, texts: list[str]) -> list[list[float]]:
     #     """多线程并行批量嵌入"""
@@ -95,12 +222,17 @@ class CacheEmbedding(Embeddings):
     #             results.extend(future.result())
     #     return results
 
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        results = []
+    def embed_documents_array(self, texts: list[str]) -> np.ndarray:
+        """批量嵌入，返回 float32 矩阵，供去重、语义切分等需要向量运算的场景直接使用"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
         batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
-        for batch in batches:
-            results.extend(self._embed_batch(batch))
-        return results
+        return np.concatenate([self._embed_batch(batch) for batch in batches])
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self.embed_documents_array(texts).tolist()
 
 
 # print("==== PyTorch 检测 ====")
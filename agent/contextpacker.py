@@ -0,0 +1,114 @@
+import os
+
+from langchain_core.documents import Document
+
+from hybridtextsplitter import get_encoding
+
+
+class ContextPacker:
+    """
+    按 token 预算打包生成用的上下文：
+    1. 按相关度排序（rerank_score / rrf_score，没有则保持检索顺序）
+    2. 同一父文档（parent_id）中位置相邻或重叠的段按 start_index 合并，去掉 chunk_overlap 造成的重复文本；
+       没有 parent_id 的段（旧索引）不合并
+    3. 按相关度依次写入，直到达到 max_tokens；最后一块放不下时按剩余预算截断
+    """
+    def __init__(self, max_tokens=3000, min_block_tokens=64, separator="\n\n"):
+        """
+        :param max_tokens: 上下文 token 预算
+        :param min_block_tokens: 剩余预算少于该值时不再截断写入，直接结束
+        """
+        self.max_tokens = max_tokens
+        self.min_block_tokens = min_block_tokens
+        self.separator = separator
+        # 编码器只创建一次，每次请求复用
+        self.encoding = get_encoding(os.getenv("MODEL_NAME"))
+
+    def _count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    @staticmethod
+    def _relevance(doc: Document, rank: int):
+        for key in ("rerank_score", "rrf_score"):
+            if key in doc.metadata:
+                return -doc.metadata[key], rank
+        return 0, rank
+
+    @staticmethod
+    def _group_key(doc: Document):
+        # start_index 相对于加载出的单条文档，同一文件的不同记录不能按它合并
+        return doc.metadata.get("parent_id")
+
+    def _merge(self, documents: list[Document]) -> list[tuple[int, str]]:
+        """合并同一父文档的相邻/重叠段，返回 (块内最高相关度的排名, 文本)，按排名排序"""
+        groups: dict[tuple, list[tuple[int, Document]]] = {}
+        blocks = []
+        seen = set()
+        for rank, doc in enumerate(documents):
+            if doc.page_content in seen:
+                continue
+            seen.add(doc.page_content)
+            if "start_index" in doc.metadata and self._group_key(doc) is not None:
+                groups.setdefault(self._group_key(doc), []).append((rank, doc))
+            else:
+                blocks.append((rank, doc.page_content))
+
+        for members in groups.values():
+            members.sort(key=lambda m: m[1].metadata["start_index"])
+            rank, doc = members[0]
+            start = doc.metadata["start_index"]
+            text = doc.page_content
+            for next_rank, next_doc in members[1:]:
+                next_start = next_doc.metadata["start_index"]
+                end = start + len(text)
+                if next_start <= end:
+                    # 相邻或重叠：只追加超出当前块末尾的部分
+                    text += next_doc.page_content[end - next_start:]
+                    rank = min(rank, next_rank)
+                else:
+                    blocks.append((rank, text))
+                    rank, start, text = next_rank, next_start, next_doc.page_content
+            blocks.append((rank, text))
+
+        blocks.sort(key=lambda b: b[0])
+        return blocks
+
+    def pack(self, documents: list[Document]) -> tuple[str, dict]:
+        """
+        :return: (上下文文本, 统计)，统计包括输入段数 chunks、写入块数 blocks、
+            直接拼接的 token 数 raw_tokens、打包后的 token 数 packed_tokens、节省的 saved_tokens、是否截断 truncated
+        """
+        ordered = [
+            doc for _, doc in sorted(
+                ((self._relevance(doc, rank), doc) for rank, doc in enumerate(documents)),
+                key=lambda item: item[0],
+            )
+        ]
+        raw_tokens = sum(self._count(doc.page_content) for doc in documents)
+
+        parts, used, truncated = [], 0, False
+        sep_tokens = self._count(self.separator)
+        for _, text in self._merge(ordered):
+            cost = self._count(text) + (sep_tokens if parts else 0)
+            if used + cost <= self.max_tokens:
+                parts.append(text)
+                used += cost
+                continue
+            truncated = True
+            remaining = self.max_tokens - used - (sep_tokens if parts else 0)
+            if remaining >= self.min_block_tokens:
+                tokens = self.encoding.encode(text, disallowed_special=())[:remaining]
+                # 截断处可能落在多字节字符中间，去掉解码出的替换字符
+                parts.append(self.encoding.decode(tokens).rstrip("\ufffd"))
+                used += remaining + (sep_tokens if len(parts) > 1 else 0)
+            break
+
+        stats = {
+            "chunks": len(documents),
+            "blocks": len(parts),
+            "raw_tokens": raw_tokens,
+            "packed_tokens": used,
+            "saved_tokens": raw_tokens - used,
+            "truncated": truncated,
+        }
+        return self.separator.join(parts), stats
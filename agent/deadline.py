@@ -0,0 +1,35 @@
+import time
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+
+# 请求截止时间（time.monotonic() 时刻）在 RunnableConfig configurable 中的键
+DEADLINE_KEY = "deadline"
+
+
+def make_deadline(timeout: Optional[float]) -> Optional[float]:
+    """由剩余秒数得到截止时刻，None 表示不限制"""
+    return time.monotonic() + timeout if timeout is not None else None
+
+
+def get_deadline(config: Optional[RunnableConfig]) -> Optional[float]:
+    return ((config or {}).get("configurable") or {}).get(DEADLINE_KEY)
+
+
+def time_left(config: Optional[RunnableConfig]) -> Optional[float]:
+    """距截止时间的剩余秒数，没有截止时间返回 None"""
+    deadline = get_deadline(config)
+    return deadline - time.monotonic() if deadline is not None else None
+
+
+def running_low(config: Optional[RunnableConfig], reserve: float) -> bool:
+    """剩余时间不足 reserve 秒：应停止改写、检索、调用工具，直接用已有信息作答"""
+    left = time_left(config)
+    return left is not None and left < reserve
+
+
+def with_deadline(deadline: Optional[float], **configurable) -> RunnableConfig:
+    """构造传给子图/工具的 config，携带截止时间"""
+    if deadline is not None:
+        configurable[DEADLINE_KEY] = deadline
+    return {"configurable": configurable}
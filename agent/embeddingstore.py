@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path):
+    """跨进程排他锁（POSIX flock / Windows msvcrt），锁住 path 对应的锁文件"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class JsonEmbeddingStore:
+    """旧版缓存：整个字典保存在一个 JSON 文件中，每次新增都整体重写"""
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    data = f.read().strip()
+                    if not data:
+                        return {}
+                    return json.loads(data)
+            except json.JSONDecodeError:
+                print(f"⚠️ 缓存文件损坏 ({self.cache_path})，已重置为空缓存。")
+                return {}
+            except Exception as e:
+                print(f"⚠️ 加载缓存时出现错误: {e}")
+                return {}
+        return {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key: str):
+        vec = self.data.get(key)
+        return None if vec is None else np.asarray(vec, dtype=np.float32)
+
+    def get_many(self, keys: list[str]) -> dict:
+        return {k: np.asarray(self.data[k], dtype=np.float32) for k in keys if k in self.data}
+
+    def add(self, items: dict):
+        if not items:
+            return
+        with self._lock:
+            self.data.update(items)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+
+
+class MmapEmbeddingStore:
+    """
+    二进制缓存：
+    - <base>.f32       float32 向量矩阵，按行追加，读取时 mmap 映射
+    - <base>.idx       每行对应的 sha256 摘要（32 字节），与矩阵行号一一对应
+    - <base>.meta.json 向量维度
+    - <base>.lock      跨进程写锁
+    新向量只追加写入，不会整体重写文件。
+    多个进程（gRPC 服务、HTTP 服务、离线构建）可共用同一缓存：追加在文件锁内进行，
+    写入前先读入其他进程已追加的行，行号以文件当前大小为准
+    """
+    HASH_BYTES = 32
+
+    def __init__(self, base_path, legacy_json_path=None):
+        self.vec_path = f"{base_path}.f32"
+        self.idx_path = f"{base_path}.idx"
+        self.meta_path = f"{base_path}.meta.json"
+        self.lock_path = f"{base_path}.lock"
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.dim = None
+        self.index: dict[bytes, int] = {}
+        self.rows = 0
+        self._matrix = None
+        self._mapped_rows = 0
+
+        with self._lock, file_lock(self.lock_path):
+            self._load()
+        if legacy_json_path and not self.index and os.path.exists(legacy_json_path):
+            self._migrate(legacy_json_path)
+
+    def _load(self):
+        """读入磁盘上新增的行（首次加载为全部行），需持有文件锁"""
+        if not os.path.exists(self.meta_path):
+            return
+        if self.dim is None:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+
+        row_bytes = self.dim * 4
+        vec_size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        idx_size = os.path.getsize(self.idx_path) if os.path.exists(self.idx_path) else 0
+        rows = min(vec_size // row_bytes, idx_size // self.HASH_BYTES)
+
+        # 写入中途中断会留下不完整的尾部，截断到两个文件都完整的行数
+        if vec_size != rows * row_bytes or idx_size != rows * self.HASH_BYTES:
+            print(f"⚠️ 缓存文件尾部不完整，已截断到 {rows} 行。")
+            with open(self.vec_path, "ab") as f:
+                f.truncate(rows * row_bytes)
+            with open(self.idx_path, "ab") as f:
+                f.truncate(rows * self.HASH_BYTES)
+
+        if rows <= self.rows:
+            return
+        with open(self.idx_path, "rb") as f:
+            f.seek(self.rows * self.HASH_BYTES)
+            digests = f.read((rows - self.rows) * self.HASH_BYTES)
+        for i in range(rows - self.rows):
+            self.index.setdefault(digests[i * self.HASH_BYTES:(i + 1) * self.HASH_BYTES], self.rows + i)
+        self.rows = rows
+
+    def _migrate(self, legacy_json_path):
+        """把旧版 JSON 缓存导入二进制缓存"""
+        legacy = JsonEmbeddingStore(legacy_json_path).data
+        if not legacy:
+            return
+        print(f"🔄 正在迁移 JSON 缓存 ({len(legacy)} 条) → {self.vec_path}")
+        keys = list(legacy)
+        for i in range(0, len(keys), 10000):
+            self.add({k: legacy[k] for k in keys[i:i + 10000]})
+        print("✅ 缓存迁移完成")
+
+    def _remap(self):
+        """追加写入后重新映射，使新增行可读"""
+        self._matrix = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        self._mapped_rows = self.rows
+
+    def __contains__(self, key: str) -> bool:
+        return bytes.fromhex(key) in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _ensure_mapped(self, max_row: int):
+        if max_row >= self._mapped_rows:
+            with self._lock:
+                if max_row >= self._mapped_rows:
+                    self._remap()
+
+    def get(self, key: str):
+        row = self.index.get(bytes.fromhex(key))
+        if row is None:
+            return None
+        self._ensure_mapped(row)
+        return np.array(self._matrix[row])
+
+    def get_many(self, keys: list[str]) -> dict:
+        """批量读取：一次花式索引从 mmap 中取出所有命中行"""
+        found, rows = [], []
+        for k in keys:
+            row = self.index.get(bytes.fromhex(k))
+            if row is not None:
+                found.append(k)
+                rows.append(row)
+        if not rows:
+            return {}
+        self._ensure_mapped(max(rows))
+        matrix = self._matrix[np.asarray(rows)]
+        return dict(zip(found, matrix))
+
+    def add(self, items: dict):
+        with self._lock, file_lock(self.lock_path):
+            # 其他进程可能已追加了行：先读入，新行的行号从文件当前行数开始
+            self._load()
+            items = {bytes.fromhex(k): v for k, v in items.items()}
+            items = {k: v for k, v in items.items() if k not in self.index}
+            if not items:
+                return
+            vectors = np.asarray(list(items.values()), dtype=np.float32)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: 缓存为 {self.dim}，新向量为 {vectors.shape[1]}")
+
+            # 先写向量再写索引：中断时只会多出没有索引的向量行，加载时会被截断
+            with open(self.vec_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.idx_path, "ab") as f:
+                f.write(b"".join(items))
+
+            for i, digest in enumerate(items):
+                self.index[digest] = self.rows + i
+            self.rows += len(items)
@@ -0,0 +1,89 @@
+"""
+调度中枢回答方式延迟基准：formatter 节点再调用一次 LLM 生成 Receipt，对比调度中枢通过 respond 工具直接给出 Receipt
+
+两种模式分别用新会话依次执行同一组多轮对话，统计每轮耗时和 LLM 调用次数。
+需要与服务相同的环境（POSTGRES_URL、模型配置、知识库）。
+
+用法（在 agent 目录下）：
+    python evaluation/bench_agent_response.py
+    python evaluation/bench_agent_response.py --turns turns.txt --repeat 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from agent import Agent
+from experts import registry
+
+DEFAULT_TURNS = [
+    "你好",
+    "断裂带对岩体完整性有什么影响？",
+    "那第四系松散堆积层主要由什么组成？",
+    "总结一下我们刚才聊了什么",
+]
+
+
+class LLMCallCounter(AsyncCallbackHandler):
+    def __init__(self):
+        self.count = 0
+
+    async def on_chat_model_start(self, *args, **kwargs):
+        self.count += 1
+
+
+async def run_mode(direct_response: bool, turns: list[str], repeat: int):
+    agent = await Agent.create(direct_response=direct_response, warmup=False)
+    # 计时前创建好各专家，避免首轮计入初始化耗时
+    await registry.warmup()
+    latencies, calls = [], []
+    try:
+        for _ in range(repeat):
+            thread_id = str(uuid.uuid4())
+            for turn in turns:
+                counter = LLMCallCounter()
+                config = {"configurable": {"thread_id": thread_id}, "callbacks": [counter]}
+                start = time.perf_counter()
+                await agent.runnable.ainvoke({"messages": [HumanMessage(content=turn)]}, config=config)
+                latencies.append(time.perf_counter() - start)
+                calls.append(counter.count)
+    finally:
+        await agent.aclose()
+    return latencies, calls
+
+
+def report(name: str, latencies: list[float], calls: list[int]):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"  {name:<10} 平均 {statistics.mean(latencies):7.2f}s  p50 {statistics.median(latencies):7.2f}s  "
+          f"p95 {p95:7.2f}s  平均 LLM 调用 {statistics.mean(calls):5.1f} 次/轮")
+
+
+async def main(turns: list[str], repeat: int):
+    print(f"对话轮数: {len(turns)}，重复 {repeat} 次")
+    for name, direct_response in (("formatter", False), ("respond", True)):
+        latencies, calls = await run_mode(direct_response, turns, repeat)
+        report(name, latencies, calls)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", default=None, help="每行一轮用户输入的文本文件，不指定则使用内置对话")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.turns:
+        with open(args.turns, "r", encoding="utf-8") as f:
+            turns = [line.strip() for line in f if line.strip()]
+    else:
+        turns = DEFAULT_TURNS
+    asyncio.run(main(turns, args.repeat))
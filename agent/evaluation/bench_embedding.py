@@ -0,0 +1,62 @@
+"""
+CacheEmbedding 批量嵌入吞吐基准
+
+分别在 0% / 50% / 100% 缓存命中率下测量 embed_documents 的吞吐（条/秒）。
+每个命中率使用独立的临时缓存目录，先预热对应比例的文本，再对完整文本集计时。
+
+用法（在 agent 目录下）：
+    python evaluation/bench_embedding.py --num 2000 --backend mmap
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from cachembedding import CacheEmbedding
+
+
+def make_texts(num: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    words = ["地层", "断裂", "岩性", "条款", "合同", "规章", "沉积", "构造", "责任", "期限", "矿产", "勘探"]
+    return [
+        f"{i}: " + "".join(rng.choice(words) for _ in range(rng.randint(20, 60)))
+        for i in range(num)
+    ]
+
+
+def run(num: int, backend: str, batch_size: int):
+    texts = make_texts(num)
+    print(f"文本数: {num}，后端: {backend}，batch_size: {batch_size}")
+    for ratio in (0.0, 0.5, 1.0):
+        with tempfile.TemporaryDirectory() as tmp:
+            embedding = CacheEmbedding(
+                os.path.join(tmp, "embeddings_cache.json"),
+                batch_size=batch_size,
+                backend=backend,
+            )
+            warm = texts[:int(num * ratio)]
+            if warm:
+                embedding.embed_documents(warm)
+            # 清空内存层，让命中走持久化缓存，更接近服务重启后的情况
+            embedding.memory.clear()
+
+            start = time.perf_counter()
+            vectors = embedding.embed_documents_array(texts)
+            elapsed = time.perf_counter() - start
+
+            assert vectors.shape[0] == num
+            print(f"  命中率 {ratio:>4.0%}: {elapsed:8.3f}s  {num / elapsed:10.1f} 条/秒")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num", type=int, default=2000)
+    parser.add_argument("--backend", choices=["json", "mmap"], default="mmap")
+    parser.add_argument("--batch-size", type=int, default=128)
+    args = parser.parse_args()
+    run(args.num, args.backend, args.batch_size)
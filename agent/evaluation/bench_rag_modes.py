@@ -0,0 +1,91 @@
+"""
+RAG 子图延迟基准：串行改写循环（rewrite）对比多查询并发检索（multi_query）
+
+对每个问题分别跑两种子图，统计端到端耗时和 LLM 调用次数。
+为保证公平，关闭语义答案缓存和改写/检索备忘，直接调用编译好的子图。
+
+用法（在 agent 目录下）：
+    python evaluation/bench_rag_modes.py --questions questions.txt --repeat 1
+    python evaluation/bench_rag_modes.py -q "断裂带的走向是什么" -q "合同的异议期限是多久"
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import HumanMessage
+
+import RAGAgent
+from experts import registry
+
+
+class LLMCallCounter(AsyncCallbackHandler):
+    def __init__(self):
+        self.count = 0
+
+    async def on_chat_model_start(self, *args, **kwargs):
+        self.count += 1
+
+
+async def run_one(app, question: str):
+    counter = LLMCallCounter()
+    inputs = {
+        "messages": [HumanMessage(content=question)],
+        "question": question,
+        "origin": question,
+        "retry_count": 0,
+        "documents": [],
+        "retrieved_ids": None,
+        "unchanged": False,
+        "queries": None,
+        "degraded": False,
+    }
+    start = time.perf_counter()
+    await app.ainvoke(inputs, {"callbacks": [counter]})
+    return time.perf_counter() - start, counter.count
+
+
+def report(name: str, latencies: list[float], calls: list[int]):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"  {name:<12} 平均 {statistics.mean(latencies):7.2f}s  p50 {statistics.median(latencies):7.2f}s  "
+          f"p95 {p95:7.2f}s  平均 LLM 调用 {statistics.mean(calls):5.1f} 次")
+
+
+async def main(questions: list[str], repeat: int):
+    # 先创建依赖，再关闭备忘（build 会重新创建备忘）
+    await registry.aget("rag")
+    RAGAgent.memo = None
+    apps = {"rewrite": RAGAgent.app, "multi_query": RAGAgent.multi_query_app}
+    print(f"问题数: {len(questions)}，重复 {repeat} 次，num_queries={RAGAgent.num_queries}，"
+          f"max_retries={RAGAgent.max_retries}")
+    for name, app in apps.items():
+        latencies, calls = [], []
+        for _ in range(repeat):
+            for question in questions:
+                elapsed, count = await run_one(app, question)
+                latencies.append(elapsed)
+                calls.append(count)
+        report(name, latencies, calls)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=None, help="每行一个问题的文本文件")
+    parser.add_argument("-q", "--question", action="append", default=[])
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    qs = list(args.question)
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            qs.extend(line.strip() for line in f if line.strip())
+    if not qs:
+        parser.error("请通过 --questions 或 -q 指定问题")
+    asyncio.run(main(qs, args.repeat))
@@ -0,0 +1,87 @@
+"""
+切分基准：原两阶段切分（字符粗切分 + tiktoken 长度控制）对比单遍 token 切分
+
+默认生成合成中文语料，也可以用 --data 指定一个 .txt 文件目录（如地质、法律文档）。
+输出两种方式的耗时、段数、平均/最大 token 数。
+
+用法（在 agent 目录下）：
+    python evaluation/bench_splitter.py --docs 200 --paragraphs 200
+    python evaluation/bench_splitter.py --data ./data
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from langchain_core.documents import Document
+
+from hybridtextsplitter import SinglePassTokenSplitter, get_encoding, make_two_stage_splitters, token_byte_lengths
+
+
+def make_corpus(num_docs: int, paragraphs: int, seed: int = 0) -> list[Document]:
+    rng = random.Random(seed)
+    phrases = [
+        "第四系松散堆积层主要由粉质黏土和砂砾石组成", "断裂带走向北东", "岩体完整性较差",
+        "根据本条例第三十二条的规定", "当事人应当在收到通知之日起十五日内提出异议",
+        "勘探线间距为二百米", "地下水位埋深约三点五米", "合同双方的权利义务如下",
+    ]
+    puncts = ["，", "。", "。", "！", "？"]
+    docs = []
+    for i in range(num_docs):
+        paras = []
+        for _ in range(paragraphs):
+            sentence = "".join(rng.choice(phrases) + rng.choice(puncts) for _ in range(rng.randint(3, 12)))
+            paras.append(sentence)
+        docs.append(Document(page_content="\n\n".join(paras), metadata={"source": f"synthetic_{i}.txt"}))
+    return docs
+
+
+def load_corpus(data_path: str) -> list[Document]:
+    docs = []
+    for name in os.listdir(data_path):
+        if name.endswith(".txt"):
+            with open(os.path.join(data_path, name), "r", encoding="utf-8") as f:
+                docs.append(Document(page_content=f.read(), metadata={"source": name}))
+    return docs
+
+
+def report(name: str, chunks: list[Document], elapsed: float, encoding, chunk_size: int):
+    lengths = [len(encoding.encode(c.page_content, disallowed_special=())) for c in chunks]
+    over = sum(1 for n in lengths if n > chunk_size)
+    print(f"  {name:<12} {elapsed:8.3f}s  段数 {len(chunks):>7}  "
+          f"平均 {sum(lengths) / max(len(lengths), 1):6.1f} token  最大 {max(lengths, default=0):>5} token  "
+          f"超长 {over}")
+
+
+def run(docs: list[Document], chunk_size: int, chunk_overlap: int):
+    encoding = get_encoding(os.getenv("MODEL_NAME"))
+    total_chars = sum(len(d.page_content) for d in docs)
+    print(f"文档数: {len(docs)}，总字符数: {total_chars}，chunk_size={chunk_size}，chunk_overlap={chunk_overlap}")
+
+    rough_splitter, lens_splitter = make_two_stage_splitters(chunk_size, chunk_overlap)
+    start = time.perf_counter()
+    chunks = lens_splitter.split_documents(rough_splitter.split_documents(docs))
+    report("two_stage", chunks, time.perf_counter() - start, encoding, chunk_size)
+
+    splitter = SinglePassTokenSplitter(chunk_size, chunk_overlap, encoding=encoding)
+    token_byte_lengths(encoding)    # 预热词表字节长度表（每个进程只构建一次）
+    start = time.perf_counter()
+    chunks = splitter.split_documents(docs)
+    report("single_pass", chunks, time.perf_counter() - start, encoding, chunk_size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=None, help="包含 .txt 文件的目录，不指定则使用合成语料")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.data) if args.data else make_corpus(args.docs, args.paragraphs)
+    run(corpus, args.chunk_size, args.chunk_overlap)
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+import dotenv
+from langchain_openai import ChatOpenAI
+
+dotenv.load_dotenv()
+
+
+@lru_cache(maxsize=None)
+def get_llm() -> ChatOpenAI:
+    """进程内共享的 LLM 客户端：调度中枢和各专家复用同一个 ChatOpenAI（及其 HTTP 连接池）"""
+    return ChatOpenAI(model=os.getenv("MODEL_NAME"))
+
+
+class ExpertRegistry:
+    """
+    专家子图的懒加载注册表：
+    - register 只登记工厂函数，导入模块时不创建任何重量级依赖（嵌入模型、Chroma、搜索客户端等）
+    - 首次使用时调用工厂创建一次，之后复用；并发的首次调用只会创建一次
+    - warmup 可在服务启动后预先创建，timings 记录各专家的初始化耗时
+    """
+    def __init__(self):
+        self._factories: dict[str, Callable[[], object]] = {}
+        self._instances: dict[str, object] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self.timings: dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], object]):
+        """
+        :param factory: 无参的同步函数，返回编译好的子图；在工作线程中执行，可以阻塞（加载模型等）
+        """
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        """同步获取，未创建时在当前线程创建"""
+        if name in self._instances:
+            return self._instances[name]
+        with self._locks[name]:
+            if name not in self._instances:
+                print(f"🔧 初始化专家 {name} ...")
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.timings[name] = time.perf_counter() - start
+                print(f"✅ 专家 {name} 初始化完成，耗时 {self.timings[name]:.2f}s")
+        return self._instances[name]
+
+    async def aget(self, name: str):
+        """异步获取，创建放到线程中执行，不阻塞事件循环"""
+        if name in self._instances:
+            return self._instances[name]
+        return await asyncio.to_thread(self.get, name)
+
+    async def warmup(self, names: Optional[Iterable[str]] = None) -> dict[str, float]:
+        """并发创建指定（默认全部）专家，单个专家失败不影响其他专家，首次使用时会重试"""
+        names = list(names) if names is not None else list(self._factories)
+        results = await asyncio.gather(*(self.aget(name) for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ 专家 {name} 预热失败: {result}")
+        return dict(self.timings)
+
+
+registry = ExpertRegistry()
+
+
+def _build_rag():
+    import RAGAgent
+    return RAGAgent.build()
+
+
+def _build_search():
+    import SearchAgent
+    return SearchAgent.build()
+
+
+registry.register("rag", _build_rag)
+registry.register("search", _build_search)
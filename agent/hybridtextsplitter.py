@@ -1,15 +1,241 @@
+import hashlib
 import os
-from typing import Literal
+import re
+from typing import Iterable, Iterator, Literal
 
 import dotenv
-from langchain_community.document_transformers import EmbeddingsRedundantFilter
+import numpy as np
+import tiktoken
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from cachembedding import CacheEmbedding
+from redundancyfilter import RedundancyFilter
 
 dotenv.load_dotenv()
 
+SEPARATORS = ["\n\n", "\n", "。", "！", "？", "，"]
+
+
+def with_parent_id(document: Document) -> Document:
+    """
+    为加载得到的文档标记 parent_id（来源 + 页码 + 内容的哈希），切分出的段都继承它。
+    start_index 只在同一 parent_id 内有意义：同一文件的多条记录（JSON 记录、CSV 行、HTML 元素等）各自从 0 开始
+    """
+    if "parent_id" in document.metadata:
+        return document
+    key = f"{document.metadata.get('source')}|{document.metadata.get('page')}|{document.page_content}"
+    parent_id = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return Document(page_content=document.page_content, metadata={**document.metadata, "parent_id": parent_id})
+
+
+def get_encoding(model_name: str = None) -> tiktoken.Encoding:
+    """按模型名获取 tiktoken 编码器，未知模型退回 cl100k_base"""
+    try:
+        return tiktoken.encoding_for_model(model_name or "")
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def make_two_stage_splitters(chunk_size: int, chunk_overlap: int):
+    """原两阶段切分：字符粗切分 + tiktoken 长度控制切分"""
+    # 粗切分
+    rough_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size*2,
+        chunk_overlap=chunk_overlap*2,
+        separators=["\n\n", "\n", "。", "！", "？"]
+    )
+    # 控制长度
+    lens_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        model_name=os.getenv("MODEL_NAME"),
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS,
+    )
+    return rough_splitter, lens_splitter
+
+
+_token_byte_lengths = {}
+
+
+def token_byte_lengths(encoding: tiktoken.Encoding) -> np.ndarray:
+    """词表中每个 token 的字节长度（按编码器缓存），用于向量化计算 token 偏移"""
+    table = _token_byte_lengths.get(encoding.name)
+    if table is None:
+        table = np.zeros(encoding.max_token_value + 1, dtype=np.int64)
+        for token in range(len(table)):
+            try:
+                table[token] = len(encoding.decode_single_token_bytes(token))
+            except KeyError:
+                pass
+        _token_byte_lengths[encoding.name] = table
+    return table
+
+
+class SinglePassTokenSplitter:
+    """
+    单遍 token 切分：每个文档只分词一次，把分隔符位置映射到 token 下标后直接在 token 序列上切分。
+    - 每段不超过 chunk_size 个 token，相邻段重叠不超过 chunk_overlap 个 token
+    - 切分点优先选择靠前的分隔符（与 separators 顺序一致），同级取窗口内最靠后的位置
+    - 窗口内没有任何分隔符时按 token 硬切
+    """
+    def __init__(self, chunk_size=500, chunk_overlap=50, separators=None, encoding: tiktoken.Encoding = None):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap 必须小于 chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or SEPARATORS
+        self.encoding = encoding or get_encoding(os.getenv("MODEL_NAME"))
+
+    def _char_offsets(self, text: str, tokens: list[int]) -> np.ndarray:
+        """每个 token 起始位置对应的字符下标（末尾追加 len(text)），跨字符的 token 归到该字符的起点"""
+        data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+        byte_starts = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(token_byte_lengths(self.encoding)[np.asarray(tokens)], out=byte_starts[1:])
+        char_of_byte = np.append(np.cumsum((data & 0xC0) != 0x80) - 1, len(text))
+        return char_of_byte[byte_starts]
+
+    def _boundary_levels(self, text: str, char_at: np.ndarray) -> np.ndarray:
+        """levels[t] 表示在第 t 个 token 之前切分的优先级，数值越小越优先"""
+        n = len(char_at) - 1
+        levels = np.full(n + 1, len(self.separators), dtype=np.int16)
+        # 从低优先级到高优先级依次覆盖
+        for level in range(len(self.separators) - 1, -1, -1):
+            ends = [m.end() for m in re.finditer(re.escape(self.separators[level]), text)]
+            if ends:
+                ts = np.searchsorted(char_at[:n], ends, side="left")
+                levels[ts[ts > 0]] = level
+        levels[n] = 0
+        return levels
+
+    def split_spans(self, text: str) -> list[tuple[int, int]]:
+        """返回每段在原文中的字符区间 [start, end)"""
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if not tokens:
+            return []
+        n = len(tokens)
+        char_at = self._char_offsets(text, tokens)
+        levels = self._boundary_levels(text, char_at)
+
+        spans, start, end = [], 0, 0
+        while start < n:
+            limit = min(start + self.chunk_size, n)
+            if limit == n:
+                end = n
+            else:
+                # 新段必须越过上一段的结尾，避免产出完全落在重叠区里的碎段
+                lo = max(start, end) + 1
+                window = levels[lo:limit + 1]
+                end = lo + int(np.flatnonzero(window == window.min())[-1])
+            spans.append((int(char_at[start]), int(char_at[end])))
+            if end == n:
+                break
+
+            # 下一段从重叠区内第一个分隔符之后开始，没有分隔符则直接回退 chunk_overlap 个 token
+            next_start = max(end - self.chunk_overlap, start + 1)
+            marks = np.flatnonzero(levels[next_start:end] < len(self.separators))
+            start = next_start + int(marks[0]) if len(marks) else next_start
+        return spans
+
+    def split_text(self, text: str) -> list[str]:
+        chunks = (text[s:e].strip() for s, e in self.split_spans(text))
+        return [c for c in chunks if c]
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        results = []
+        for doc in documents:
+            # 输入本身是切分结果（如语义段）时，start_index 在它的基础上累加
+            base = doc.metadata.get("start_index", 0)
+            for s, e in self.split_spans(doc.page_content):
+                raw = doc.page_content[s:e]
+                chunk = raw.strip()
+                if not chunk:
+                    continue
+                results.append(Document(
+                    page_content=chunk,
+                    metadata={**doc.metadata, "start_index": base + s + len(raw) - len(raw.lstrip())},
+                ))
+        return results
+
+
+class SemanticSplitter:
+    """
+    语义切分：按句切分后以 buffer_size 为窗口拼接上下文，批量嵌入所有窗口，
+    用 NumPy 一次算出相邻窗口的余弦距离，距离超过阈值处作为段落边界。
+    阈值计算方式与 langchain_experimental 的 SemanticChunker 一致。
+    """
+    SENTENCE_PATTERN = re.compile(r"[^。！？!?\n]+[。！？!?\n]*|[。！？!?\n]+")
+
+    def __init__(
+        self,
+        embedding_model: CacheEmbedding,
+        buffer_size=1,
+        threshold_type: Literal["percentile", "standard_deviation", "interquartile", "gradient"] = "percentile",
+        threshold_amount=95.0,
+    ):
+        if threshold_type not in ("percentile", "standard_deviation", "interquartile", "gradient"):
+            raise ValueError(f"不支持的阈值类型: {threshold_type}")
+        self.embedding_model = embedding_model
+        self.buffer_size = buffer_size
+        self.threshold_type = threshold_type
+        self.threshold_amount = threshold_amount
+
+    def _sentences(self, text: str) -> list[tuple[int, int]]:
+        return [m.span() for m in self.SENTENCE_PATTERN.finditer(text) if m.group().strip()]
+
+    def _windows(self, text: str, spans: list[tuple[int, int]]) -> list[str]:
+        """每句与前后 buffer_size 句拼接，作为该句的嵌入文本"""
+        b = self.buffer_size
+        return [
+            text[spans[max(i - b, 0)][0]:spans[min(i + b, len(spans) - 1)][1]]
+            for i in range(len(spans))
+        ]
+
+    def _breakpoints(self, vectors: np.ndarray) -> np.ndarray:
+        """返回作为段落结尾的句子下标"""
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        distances = 1.0 - np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+        if self.threshold_type == "gradient":
+            scores = np.gradient(distances) if len(distances) > 1 else distances
+            threshold = np.percentile(scores, self.threshold_amount)
+        else:
+            scores = distances
+            if self.threshold_type == "percentile":
+                threshold = np.percentile(distances, self.threshold_amount)
+            elif self.threshold_type == "standard_deviation":
+                threshold = distances.mean() + self.threshold_amount * distances.std()
+            else:
+                q1, q3 = np.percentile(distances, [25, 75])
+                threshold = distances.mean() + self.threshold_amount * (q3 - q1)
+        return np.flatnonzero(scores > threshold)
+
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        # 所有文档的句子窗口一次性批量嵌入
+        sentence_spans = [self._sentences(doc.page_content) for doc in documents]
+        windows = [
+            w for doc, spans in zip(documents, sentence_spans)
+            for w in self._windows(doc.page_content, spans)
+        ]
+        vectors = self.embedding_model.embed_documents_array(windows) if windows else None
+
+        results, offset = [], 0
+        for doc, spans in zip(documents, sentence_spans):
+            text = doc.page_content
+            doc_vectors = vectors[offset:offset + len(spans)] if spans else None
+            offset += len(spans)
+            if len(spans) < 2:
+                if text.strip():
+                    results.append(Document(page_content=text, metadata={**doc.metadata, "start_index": 0}))
+                continue
+
+            ends = list(self._breakpoints(doc_vectors)) + [len(spans) - 1]
+            start = 0
+            for end in ends:
+                s, e = spans[start][0], spans[end][1]
+                results.append(Document(page_content=text[s:e], metadata={**doc.metadata, "start_index": s}))
+                start = end + 1
+        return results
+
 
 class HybridTextSplitter:
     def __init__(
@@ -22,61 +248,108 @@ class HybridTextSplitter:
         threshold_amount=95.0,
         similarity_threshold=0.97,
         enable_filter=True,
+        embedding_model: CacheEmbedding = None,
+        split_mode: Literal["single_pass", "two_stage"] = "single_pass",
+        enable_semantic=False,
     ):
+        """
+        :param split_mode: "single_pass" 每个文档只分词一次，按 token 控制长度；
+            "two_stage" 为原来的字符粗切分 + tiktoken 长度控制切分
+        :param enable_semantic: 是否先按语义边界切分（使用 buffer_size / threshold_type / threshold_amount），
+            语义段再经过长度控制切分
+        """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.embedding_model = CacheEmbedding(cache_path)
+        # 允许外部传入已创建的 embedding，避免同一缓存文件被多个实例同时写入
+        self.embedding_model = embedding_model or CacheEmbedding(cache_path)
         self.buffer_size = buffer_size
         self.threshold_type = threshold_type
         self.threshold_amount = threshold_amount
         self.similarity_threshold = similarity_threshold
         self.enable_filter = enable_filter
+        self.split_mode = split_mode
+        self.enable_semantic = enable_semantic
 
-        # 粗切分
-        self.rough_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size*2,
-            chunk_overlap=self.chunk_overlap*2,
-            separators=["\n\n", "\n", "。", "！", "？"]
-        )
-        # 控制长度
-        self.lens_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            model_name=os.getenv("MODEL_NAME"),
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=["\n\n", "\n", "。", "！", "？", "，"],
-        )
-        # # 按语义切
-        # self.semantic_splitter = SemanticChunker(
-        #     embeddings=self.embedding_model,
-        #     buffer_size=self.buffer_size,
-        #     breakpoint_threshold_type=self.threshold_type,
-        #     breakpoint_threshold_amount=self.threshold_amount,
-        # )
+        if self.split_mode == "single_pass":
+            self.token_splitter = SinglePassTokenSplitter(self.chunk_size, self.chunk_overlap)
+        else:
+            self.rough_splitter, self.lens_splitter = make_two_stage_splitters(self.chunk_size, self.chunk_overlap)
+        # 按语义切
+        if self.enable_semantic:
+            self.semantic_splitter = SemanticSplitter(
+                embedding_model=self.embedding_model,
+                buffer_size=self.buffer_size,
+                threshold_type=self.threshold_type,
+                threshold_amount=self.threshold_amount,
+            )
         # 冗余过滤
         if self.enable_filter:
-            self.filter = EmbeddingsRedundantFilter(
-                embeddings=self.embedding_model,
+            self.filter = RedundancyFilter(
+                embedding_model=self.embedding_model,
                 similarity_threshold=self.similarity_threshold,
             )
 
     def split(self, documents: list[Document]) -> list[Document]:
         """完整切分流程"""
-        print("Step 1️⃣ 粗切分 ...")
-        results = self.rough_splitter.split_documents(documents)
-        print(f"  → 粗切分结果: {len(results)} 段")
+        documents = [with_parent_id(doc) for doc in documents]
+        if self.enable_semantic:
+            print("Step 0️⃣ 语义切分 ...")
+            documents = self.semantic_splitter.split_documents(documents)
+            print(f"  → 语义切分结果: {len(documents)} 段")
+
+        if self.split_mode == "single_pass":
+            print("Step 1️⃣ 单遍 token 切分 ...")
+            results = self.token_splitter.split_documents(documents)
+            print(f"  → 切分结果: {len(results)} 段")
+        else:
+            print("Step 1️⃣ 粗切分 ...")
+            results = self.rough_splitter.split_documents(documents)
+            print(f"  → 粗切分结果: {len(results)} 段")
 
-        print("Step 2️⃣ 长度控制切分 ...")
-        results = self.lens_splitter.split_documents(results)
-        print(f"  → 长度控制后: {len(results)} 段")
+            print("Step 2️⃣ 长度控制切分 ...")
+            results = self.lens_splitter.split_documents(results)
+            print(f"  → 长度控制后: {len(results)} 段")
 
         if self.enable_filter:
-            print("Step 3️⃣ 冗余过滤 (EmbeddingsRedundantFilter) ...")
-            results = self.filter.transform_documents(results)
+            print("Step 3️⃣ 冗余过滤 (哈希去重 + 向量近邻) ...")
+            self.filter.reset()
+            results = self.filter.filter(results)
             print(f"  → 去重后: {len(results)} 段")
 
-        # print("Step 4️⃣ 语义切分 (SemanticChunker) ...")
-        # results = self.semantic_splitter.split_documents(results)
-        # print(f"  → 语义切分结果: {len(results)} 段")
-
         print("✅ 切分完成")
         return results
+
+    def _split_one(self, document: Document) -> list[Document]:
+        """单个文档切分"""
+        documents = [with_parent_id(document)]
+        if self.enable_semantic:
+            documents = self.semantic_splitter.split_documents(documents)
+        if self.split_mode == "single_pass":
+            return self.token_splitter.split_documents(documents)
+        results = self.rough_splitter.split_documents(documents)
+        return self.lens_splitter.split_documents(results)
+
+    def _filter_batch(self, chunks: list[Document]) -> list[Document]:
+        if not self.enable_filter or not chunks:
+            return chunks
+        return self.filter.filter(chunks)
+
+    def reset_filter(self):
+        """清空冗余过滤器保留的状态，每次构建开始时调用"""
+        if self.enable_filter:
+            self.filter.reset()
+
+    def split_stream(self, documents: Iterable[Document], batch_size=256) -> Iterator[list[Document]]:
+        """
+        流式切分：逐个文档切分，攒够 batch_size 段就过滤并产出一批，
+        切分本身的内存占用只与批大小有关。冗余过滤器跨批保留已入库段的向量，
+        可对整个语料去重，需在构建开始时调用 reset_filter()
+        """
+        buffer = []
+        for document in documents:
+            buffer.extend(self._split_one(document))
+            while len(buffer) >= batch_size:
+                batch, buffer = buffer[:batch_size], buffer[batch_size:]
+                yield self._filter_batch(batch)
+        if buffer:
+            yield self._filter_batch(buffer)
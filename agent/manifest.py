@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+
+
+class IndexManifest:
+    """
+    增量索引清单：记录每个数据文件的指纹和它写入 Chroma 的段 id
+    {item: {"size": 字节数, "mtime": 修改时间(ns), "hash": 内容 sha256, "chunk_ids": [...]}}
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries: dict[str, dict] = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ 索引清单读取失败 ({e})，将重新索引所有文件。")
+            return {}
+
+    def save(self):
+        # 先写临时文件再替换，避免中断时留下半个清单
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def stat(path) -> tuple[int, int]:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def content_hash(path) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def get(self, item: str):
+        return self.entries.get(item)
+
+    def set(self, item: str, size: int, mtime: int, content_hash: str, chunk_ids: list[str]):
+        self.entries[item] = {"size": size, "mtime": mtime, "hash": content_hash, "chunk_ids": chunk_ids}
+
+    def pop(self, item: str):
+        return self.entries.pop(item, None)
+
+    def items(self) -> list[str]:
+        return list(self.entries)
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+from typing import Literal, Optional
+
+import numpy as np
+
+
+class _FrequencySketch:
+    """TinyLFU 使用的 Count-Min Sketch，定期减半计数以淡化历史热度"""
+    def __init__(self, capacity: int, depth: int = 4):
+        width = 1
+        while width < max(capacity, 16) * 4:
+            width <<= 1
+        self.mask = width - 1
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.uint8)
+        self.sample_size = width * 10
+        self.additions = 0
+
+    def _indexes(self, key: str):
+        h = hash(key)
+        return [((h >> (i * 16)) ^ (h * (i + 1))) & self.mask for i in range(self.depth)]
+
+    def increment(self, key: str):
+        for row, col in enumerate(self._indexes(key)):
+            if self.table[row, col] < 255:
+                self.table[row, col] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table >>= 1
+            self.additions //= 2
+
+    def frequency(self, key: str) -> int:
+        return int(min(self.table[row, col] for row, col in enumerate(self._indexes(key))))
+
+
+class MemoryCache:
+    """
+    线程安全的有界内存缓存（向量以 float32 数组保存）
+    - 按条目数和/或字节数限制容量
+    - policy="lru"：淘汰最久未使用的条目
+    - policy="tinylfu"：LRU 顺序选出候选淘汰者，新条目访问频率更高时才允许挤掉它
+    """
+    def __init__(
+        self,
+        max_entries: Optional[int] = 50000,
+        max_bytes: Optional[int] = None,
+        policy: Literal["lru", "tinylfu"] = "lru",
+    ):
+        if policy not in ("lru", "tinylfu"):
+            raise ValueError(f"不支持的淘汰策略: {policy}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._data: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._sketch = _FrequencySketch(max_entries or 50000) if policy == "tinylfu" else None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def _over_capacity(self, extra_entries=0, extra_bytes=0) -> bool:
+        if self.max_entries is not None and len(self._data) + extra_entries > self.max_entries:
+            return True
+        if self.max_bytes is not None and self._bytes + extra_bytes > self.max_bytes:
+            return True
+        return False
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if self._sketch is not None:
+                self._sketch.increment(key)
+            vec = self._data.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, key: str, vec) -> None:
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return
+            if self.max_bytes is not None and vec.nbytes > self.max_bytes:
+                self.rejections += 1
+                return
+
+            while self._data and self._over_capacity(1, vec.nbytes):
+                victim = next(iter(self._data))
+                if self._sketch is not None and self._sketch.frequency(key) <= self._sketch.frequency(victim):
+                    self.rejections += 1
+                    return
+                self._bytes -= self._data.pop(victim).nbytes
+                self.evictions += 1
+
+            self._data[key] = vec
+            self._bytes += vec.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "policy": self.policy,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "rejections": self.rejections,
+            }
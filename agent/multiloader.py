@@ -1,5 +1,9 @@
 import hashlib
 import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator
 
 from datasets import load_dataset
 from langchain_community.document_loaders import (
@@ -14,11 +18,26 @@ from langchain_core.document_loaders.base import BaseLoader
 from langchain_core.documents import Document
 
 
+def _load_in_worker(path: str, filename: str):
+    """子进程入口：加载单个文件，返回文档和耗时"""
+    start = time.perf_counter()
+    docs = MultiLoader(path)._load_file(filename)
+    return docs, time.perf_counter() - start
+
+
 class MultiLoader(BaseLoader):
     """加载指定目录下的 huggingface 数据集和本地文件"""
-    def __init__(self, path: str):
+    def __init__(self, path: str, workers: int = 1):
+        """
+        :param path: 数据目录
+        :param workers: 并行加载的进程数，<= 1 时在当前进程顺序加载。
+            多进程模式下入口脚本需放在 if __name__ == "__main__" 中（Windows 使用 spawn 启动子进程）
+        """
         super().__init__()
         self.path = path
+        self.workers = workers
+        # 文件类型 -> {"files": 文件数, "docs": 文档数, "seconds": 累计耗时}
+        self.timings = defaultdict(lambda: {"files": 0, "docs": 0, "seconds": 0.0})
 
     @staticmethod
     def _convert_huggingface_path(dirname: str) -> str:
@@ -99,19 +118,94 @@ class MultiLoader(BaseLoader):
         except Exception as e:
             return [Document(page_content="", metadata={"source": path, "error": str(e)})]
 
-    def load(self):
-        """加载路径下所有文件"""
-        # 读取目录下所有文件名
-        items = os.listdir(self.path)
-        docs = []
-        for item in items:
+    def list_items(self) -> list[str]:
+        """列出待加载的文件名和 huggingface 数据集路径"""
+        items = []
+        for item in os.listdir(self.path):
             if item == "huggingface":
                 # 获取 huggingface 文件夹下所有缓存目录
                 dirs = os.listdir(os.path.join(self.path, item))
-                for dirname in dirs:
-                    path = self._convert_huggingface_path(dirname)
-                    docs.extend(self._load_file(path))
+                items.extend(self._convert_huggingface_path(dirname) for dirname in dirs)
             else:
-                docs.extend(self._load_file(item))
-        return docs
+                items.append(item)
+        return items
+
+    def item_path(self, item: str):
+        """本地文件返回磁盘路径，huggingface 数据集返回 None"""
+        if self._is_huggingface_path(item):
+            return None
+        return os.path.join(self.path, item)
+
+    def _file_type(self, filename: str) -> str:
+        if self._is_huggingface_path(filename):
+            return "huggingface"
+        return os.path.splitext(filename)[1].lower() or "(none)"
+
+    def _record(self, filename: str, docs: list[Document], seconds: float):
+        stat = self.timings[self._file_type(filename)]
+        stat["files"] += 1
+        stat["docs"] += len(docs)
+        stat["seconds"] += seconds
 
+    def _iter_parallel(self, items: list[str]) -> Iterator[tuple[str, list[Document]]]:
+        """多进程加载，按完成顺序返回；在途任务数有上限，避免结果堆积占用内存"""
+        max_pending = self.workers * 4
+        pending = {}
+        items = iter(items)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                for item in items:
+                    pending[executor.submit(_load_in_worker, self.path, item)] = item
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        docs, seconds = future.result()
+                    except Exception as e:
+                        source = item if self._is_huggingface_path(item) else os.path.join(self.path, item)
+                        docs, seconds = [Document(page_content="", metadata={"source": source, "error": str(e)})], 0.0
+                    self._record(item, docs, seconds)
+                    yield item, docs
+
+    def _iter_sequential(self, items: list[str]) -> Iterator[tuple[str, list[Document]]]:
+        for item in items:
+            start = time.perf_counter()
+            docs = self._load_file(item)
+            self._record(item, docs, time.perf_counter() - start)
+            yield item, docs
+
+    def iter_files(self, items: list[str] = None) -> Iterator[tuple[str, list[Document]]]:
+        """
+        按文件加载，每加载完一个文件产出 (文件名, 文档列表)
+        :param items: 只加载指定的文件，默认加载目录下所有文件
+        """
+        self.timings.clear()
+        items = self.list_items() if items is None else items
+        if self.workers > 1 and len(items) > 1:
+            yield from self._iter_parallel(items)
+        else:
+            yield from self._iter_sequential(items)
+        self.report_timings()
+
+    def lazy_load(self) -> Iterator[Document]:
+        """逐个文件加载，加载完一个文件就产出它的文档"""
+        for _, docs in self.iter_files():
+            yield from docs
+
+    def report_timings(self):
+        """打印各文件类型的加载耗时"""
+        if not self.timings:
+            return
+        print("📊 各文件类型加载耗时：")
+        for file_type, stat in sorted(self.timings.items(), key=lambda kv: -kv[1]["seconds"]):
+            avg = stat["seconds"] / stat["files"]
+            print(f"  {file_type:<12} 文件 {stat['files']:>5}  文档 {stat['docs']:>7}  "
+                  f"累计 {stat['seconds']:8.2f}s  平均 {avg:6.3f}s/文件")
+
+    def load(self):
+        """加载路径下所有文件"""
+        return list(self.lazy_load())
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x61gent.proto\"[\n\x0bRegisterReq\x12\x1a\n\x08username\x18\x01 \x01(\tR\x08username\x12\x1a\n\x08password\x18\x02 \x01(\tR\x08password\x12\x14\n\x05\x65mail\x18\x03 \x01(\tR\x05\x65mail\"*\n\x0cRegisterResp\x12\x1a\n\x08username\x18\x01 \x01(\tR\x08username\"B\n\x08LoginReq\x12\x1a\n\x08username\x18\x01 \x01(\tR\x08username\x12\x1a\n\x08password\x18\x02 \x01(\tR\x08password\"r\n\tLoginResp\x12!\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\tR\x0b\x61\x63\x63\x65ssToken\x12#\n\rrefresh_token\x18\x02 \x01(\tR\x0crefreshToken\x12\x1d\n\nexpires_at\x18\x03 \x01(\x03R\texpiresAt\"6\n\x0fRefreshTokenReq\x12#\n\rrefresh_token\x18\x01 \x01(\tR\x0crefreshToken\"<\n\x07\x43hatReq\x12\x1b\n\tthread_id\x18\x01 \x01(\tR\x08threadId\x12\x14\n\x05query\x18\x02 \x01(\tR\x05query\"&\n\x08\x43hatResp\x12\x1a\n\x08response\x18\x01 \x01(\tR\x08response2\x84\x01\n\x0bUserService\x12\'\n\x08Register\x12\x0c.RegisterReq\x1a\r.RegisterResp\x12\x1e\n\x05Login\x12\t.LoginReq\x1a\n.LoginResp\x12,\n\x0cRefreshToken\x12\x10.RefreshTokenReq\x1a\n.LoginResp2/\n\x0c\x41gentService\x12\x1f\n\x04\x43hat\x12\x08.ChatReq\x1a\t.ChatResp(\x01\x30\x01\x42(Z&github.com/Wh1teCaat/multi-agent/protob\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x61gent.proto\"[\n\x0bRegisterReq\x12\x1a\n\x08username\x18\x01 \x01(\tR\x08username\x12\x1a\n\x08password\x18\x02 \x01(\tR\x08password\x12\x14\n\x05\x65mail\x18\x03 \x01(\tR\x05\x65mail\"*\n\x0cRegisterResp\x12\x1a\n\x08username\x18\x01 \x01(\tR\x08username\"B\n\x08LoginReq\x12\x1a\n\x08username\x18\x01 \x01(\tR\x08username\x12\x1a\n\x08password\x18\x02 \x01(\tR\x08password\"r\n\tLoginResp\x12!\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\tR\x0b\x61\x63\x63\x65ssToken\x12#\n\rrefresh_token\x18\x02 \x01(\tR\x0crefreshToken\x12\x1d\n\nexpires_at\x18\x03 \x01(\x03R\texpiresAt\"6\n\x0fRefreshTokenReq\x12#\n\rrefresh_token\x18\x01 \x01(\tR\x0crefreshToken\"[\n\x07\x43hatReq\x12\x1b\n\tthread_id\x18\x01 \x01(\tR\x08threadId\x12\x14\n\x05query\x18\x02 \x01(\tR\x05query\x12\x1d\n\nrequest_id\x18\x03 \x01(\tR\trequestId\"\x92\x01\n\x08\x43hatResp\x12\x1a\n\x08response\x18\x01 \x01(\tR\x08response\x12\x14\n\x05\x66inal\x18\x02 \x01(\x08R\x05\x66inal\x12\x18\n\x07sources\x18\x03 \x03(\tR\x07sources\x12\x1b\n\tthread_id\x18\x04 \x01(\tR\x08threadId\x12\x1d\n\nrequest_id\x18\x05 \x01(\tR\trequestId2\x84\x01\n\x0bUserService\x12\'\n\x08Register\x12\x0c.RegisterReq\x1a\r.RegisterResp\x12\x1e\n\x05Login\x12\t.LoginReq\x1a\n.LoginResp\x12,\n\x0cRefreshToken\x12\x10.RefreshTokenReq\x1a\n.LoginResp2/\n\x0c\x41gentService\x12\x1f\n\x04\x43hat\x12\x08.ChatReq\x1a\t.ChatResp(\x01\x30\x01\x42(Z&github.com/Wh1teCaat/multi-agent/protob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -43,11 +43,11 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_REFRESHTOKENREQ']._serialized_start=336
   _globals['_REFRESHTOKENREQ']._serialized_end=390
   _globals['_CHATREQ']._serialized_start=392
-  _globals['_CHATREQ']._serialized_end=452
-  _globals['_CHATRESP']._serialized_start=454
-  _globals['_CHATRESP']._serialized_end=492
-  _globals['_USERSERVICE']._serialized_start=495
-  _globals['_USERSERVICE']._serialized_end=627
-  _globals['_AGENTSERVICE']._serialized_start=629
-  _globals['_AGENTSERVICE']._serialized_end=676
+  _globals['_CHATREQ']._serialized_end=483
+  _globals['_CHATRESP']._serialized_start=486
+  _globals['_CHATRESP']._serialized_end=632
+  _globals['_USERSERVICE']._serialized_start=635
+  _globals['_USERSERVICE']._serialized_end=767
+  _globals['_AGENTSERVICE']._serialized_start=769
+  _globals['_AGENTSERVICE']._serialized_end=816
 # @@protoc_insertion_point(module_scope)
@@ -4,7 +4,9 @@ isort:skip_file
 """
 
 import builtins
+import collections.abc
 import google.protobuf.descriptor
+import google.protobuf.internal.containers
 import google.protobuf.message
 import sys
 import typing
@@ -120,15 +122,19 @@ class ChatReq(google.protobuf.message.Message):
 
     THREAD_ID_FIELD_NUMBER: builtins.int
     QUERY_FIELD_NUMBER: builtins.int
+    REQUEST_ID_FIELD_NUMBER: builtins.int
     thread_id: builtins.str
     query: builtins.str
+    request_id: builtins.str
+    """请求 ID，响应中原样带回；为空时由服务端生成"""
     def __init__(
         self,
         *,
         thread_id: builtins.str = ...,
         query: builtins.str = ...,
+        request_id: builtins.str = ...,
     ) -> None: ...
-    _ClearFieldArgType: typing_extensions.TypeAlias = typing.Literal["query", b"query", "thread_id", b"thread_id"]
+    _ClearFieldArgType: typing_extensions.TypeAlias = typing.Literal["query", b"query", "request_id", b"request_id", "thread_id", b"thread_id"]
     def ClearField(self, field_name: _ClearFieldArgType) -> None: ...
 
 Global___ChatReq: typing_extensions.TypeAlias = ChatReq
@@ -138,13 +144,32 @@ class ChatResp(google.protobuf.message.Message):
     DESCRIPTOR: google.protobuf.descriptor.Descriptor
 
     RESPONSE_FIELD_NUMBER: builtins.int
+    FINAL_FIELD_NUMBER: builtins.int
+    SOURCES_FIELD_NUMBER: builtins.int
+    THREAD_ID_FIELD_NUMBER: builtins.int
+    REQUEST_ID_FIELD_NUMBER: builtins.int
     response: builtins.str
+    """final 为 false 时是增量 token，为 true 时是完整回答"""
+    final: builtins.bool
+    """本轮回答结束标记"""
+    thread_id: builtins.str
+    """对应请求的会话 ID"""
+    request_id: builtins.str
+    """对应请求的请求 ID，同一流内多个请求并发处理时据此匹配响应"""
+    @property
+    def sources(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.str]:
+        """回答引用的来源，仅 final 消息携带"""
+
     def __init__(
         self,
         *,
         response: builtins.str = ...,
+        final: builtins.bool = ...,
+        sources: collections.abc.Iterable[builtins.str] | None = ...,
+        thread_id: builtins.str = ...,
+        request_id: builtins.str = ...,
     ) -> None: ...
-    _ClearFieldArgType: typing_extensions.TypeAlias = typing.Literal["response", b"response"]
+    _ClearFieldArgType: typing_extensions.TypeAlias = typing.Literal["final", b"final", "request_id", b"request_id", "response", b"response", "sources", b"sources", "thread_id", b"thread_id"]
     def ClearField(self, field_name: _ClearFieldArgType) -> None: ...
 
 Global___ChatResp: typing_extensions.TypeAlias = ChatResp
@@ -0,0 +1,113 @@
+import hashlib
+from typing import Literal
+
+import numpy as np
+from langchain_core.documents import Document
+
+from cachembedding import CacheEmbedding
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+class RedundancyFilter:
+    """
+    近重复段过滤，替代 EmbeddingsRedundantFilter 的 O(n²) 全量相似度矩阵：
+    1. 按内容哈希精确去重
+    2. 向量取自 CacheEmbedding（命中缓存则不重复编码），归一化后按块计算余弦相似度
+    3. 保留先出现的段，与任一已保留段相似度 > similarity_threshold 的段被丢弃
+
+    已保留段的向量跨多次 filter 调用累积，流式构建时可对整个语料去重；
+    backend="faiss" 时用 HNSW 近邻索引查询已保留段，耗时不再随已保留段数线性增长。
+    """
+    def __init__(
+        self,
+        embedding_model: CacheEmbedding,
+        similarity_threshold=0.97,
+        block_size=1024,
+        backend: Literal["auto", "numpy", "faiss"] = "auto",
+    ):
+        if backend == "auto":
+            backend = "faiss" if faiss is not None else "numpy"
+        if backend == "faiss" and faiss is None:
+            raise ImportError("backend='faiss' 需要安装 faiss-cpu")
+        self.embedding_model = embedding_model
+        self.similarity_threshold = similarity_threshold
+        self.block_size = block_size
+        self.backend = backend
+        self.reset()
+
+    def reset(self):
+        """清空已保留段的状态，开始新一轮过滤"""
+        self._hashes = set()
+        self._kept = None       # numpy 后端：预分配的已保留向量矩阵
+        self._count = 0
+        self._index = None      # faiss 后端：HNSW 索引
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _max_sim_to_kept(self, block: np.ndarray) -> np.ndarray:
+        """block 中每个向量与已保留向量的最大相似度"""
+        if self._count == 0:
+            return np.full(len(block), -1.0, dtype=np.float32)
+        if self.backend == "faiss":
+            sims, _ = self._index.search(block, 1)
+            return sims[:, 0]
+        best = np.full(len(block), -1.0, dtype=np.float32)
+        for start in range(0, self._count, self.block_size):
+            kept = self._kept[start:start + self.block_size]
+            np.maximum(best, (block @ kept.T).max(axis=1), out=best)
+        return best
+
+    def _add_kept(self, vectors: np.ndarray):
+        if not len(vectors):
+            return
+        if self.backend == "faiss":
+            if self._index is None:
+                self._index = faiss.IndexHNSWFlat(vectors.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            self._index.add(vectors)
+        else:
+            if self._kept is None:
+                self._kept = np.empty((max(self.block_size, len(vectors)), vectors.shape[1]), dtype=np.float32)
+            needed = self._count + len(vectors)
+            if needed > len(self._kept):
+                grown = np.empty((max(needed, len(self._kept) * 2), self._kept.shape[1]), dtype=np.float32)
+                grown[:self._count] = self._kept[:self._count]
+                self._kept = grown
+            self._kept[self._count:needed] = vectors
+        self._count += len(vectors)
+
+    def filter(self, documents: list[Document]) -> list[Document]:
+        # 1. 精确去重
+        unique_docs = []
+        for doc in documents:
+            _hash = hashlib.md5(doc.page_content.encode("utf-8")).hexdigest()
+            if _hash not in self._hashes:
+                self._hashes.add(_hash)
+                unique_docs.append(doc)
+        if not unique_docs:
+            return []
+
+        # 2. 近重复过滤
+        vectors = self._normalize(
+            self.embedding_model.embed_documents_array([d.page_content for d in unique_docs])
+        )
+        results = []
+        for start in range(0, len(unique_docs), self.block_size):
+            block = np.ascontiguousarray(vectors[start:start + self.block_size])
+            keep = self._max_sim_to_kept(block) <= self.similarity_threshold
+
+            # 块内贪心：保留靠前的段，丢弃与它过于相似的靠后段
+            sims = block @ block.T
+            for i in range(len(block)):
+                if keep[i]:
+                    keep[i + 1:] &= sims[i, i + 1:] <= self.similarity_threshold
+
+            self._add_kept(block[keep])
+            results.extend(doc for doc, k in zip(unique_docs[start:start + self.block_size], keep) if k)
+        return results
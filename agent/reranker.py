@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from sentence_transformers import CrossEncoder
+
+
+class CrossEncoderReranker:
+    """
+    本地 CPU cross-encoder 重排：一次批量前向计算所有 (问题, 文档段) 的相关性得分，
+    按阈值给出 yes/no，介于两个阈值之间的段视为“拿不准”，交给 LLM 评审
+    """
+    def __init__(
+        self,
+        model_name="BAAI/bge-reranker-base",
+        high_cutoff=0.7,
+        low_cutoff=0.3,
+        batch_size=32,
+        max_length=512,
+        device="cpu",
+    ):
+        """
+        :param model_name: cross-encoder 模型名称或本地路径
+        :param high_cutoff: 得分 >= high_cutoff 判为 yes
+        :param low_cutoff: 得分 < low_cutoff 判为 no；二者之间交给 LLM 评审（两者相等则不调用 LLM）
+        :param batch_size: 单次前向计算的批大小
+        :param max_length: (问题, 文档段) 拼接后的最大 token 数
+        """
+        if low_cutoff > high_cutoff:
+            raise ValueError("low_cutoff 不能大于 high_cutoff")
+        self.model_name = model_name
+        self.high_cutoff = high_cutoff
+        self.low_cutoff = low_cutoff
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self._model = None
+        # 模型首次使用时加载；推理放到专用线程执行，不阻塞事件循环
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+    def _get_model(self) -> CrossEncoder:
+        if self._model is None:
+            self._model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+        return self._model
+
+    def load(self):
+        """预先加载模型（服务预热时调用），之后的首次打分不再付出加载耗时"""
+        with self._model_lock:
+            self._get_model()
+        return self
+
+    def score(self, question: str, texts: list[str]) -> np.ndarray:
+        """返回每个文档段的相关性得分（单标签模型经 sigmoid 归一化到 0~1）"""
+        if not texts:
+            return np.empty(0, dtype=np.float32)
+        with self._model_lock:
+            scores = self._get_model().predict(
+                [(question, text) for text in texts],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+        return np.asarray(scores, dtype=np.float32).reshape(len(texts))
+
+    async def ascore(self, question: str, texts: list[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.score, question, texts)
+
+    def grade(self, scores: np.ndarray) -> list[Optional[str]]:
+        """按阈值把得分映射为 "yes" / "no"，拿不准的返回 None"""
+        grades = []
+        for score in scores:
+            if score >= self.high_cutoff:
+                grades.append("yes")
+            elif score < self.low_cutoff:
+                grades.append("no")
+            else:
+                grades.append(None)
+        return grades
@@ -1,11 +1,18 @@
+import asyncio
 import hashlib
 import os
 from enum import Enum
 
 from langchain_chroma import Chroma
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
 
+from bm25index import BM25Index
 from cachembedding import CacheEmbedding
 from hybridtextsplitter import HybridTextSplitter
+from manifest import IndexManifest
 from multiloader import MultiLoader
 
 
@@ -14,35 +21,182 @@ class RunMode(Enum):
     OFFLINE = "offline"
 
 
+class VectorRetriever(BaseRetriever):
+    """向量检索器：异步路径走 CacheEmbedding.aembed_query，并发查询合批编码，不阻塞事件循环"""
+    vectorstore: Chroma
+    embedding: CacheEmbedding
+    k: int = 4
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        vec = self.embedding.embed_query(query)
+        return self.vectorstore.similarity_search_by_vector(vec, k=self.k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        vec = await self.embedding.aembed_query(query)
+        return await asyncio.to_thread(self.vectorstore.similarity_search_by_vector, vec, k=self.k)
+
+
+def get_documents_by_ids(vectorstore: Chroma, ids: list[str]) -> list[Document]:
+    """按段 id 从 Chroma 取回文档段，保持 ids 的顺序，已不存在的段跳过"""
+    if not ids:
+        return []
+    got = vectorstore.get(ids=ids, include=["documents", "metadatas"])
+    by_id = {
+        _id: Document(id=_id, page_content=text, metadata=metadata or {})
+        for _id, text, metadata in zip(got["ids"], got["documents"], got["metadatas"])
+    }
+    return [by_id[_id] for _id in ids if _id in by_id]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    混合检索器：BM25 词法检索与向量检索并发执行，按倒数排名融合（RRF）取前 k 个
+    - 各路各取 fetch_k 个候选，段的融合得分为 Σ 1 / (rrf_k + 排名)
+    - 只被 BM25 命中的段按 id 从 Chroma 取回正文
+    """
+    vectorstore: Chroma
+    embedding: CacheEmbedding
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _fuse(self, vector_docs: list[Document], lexical_hits: list[tuple[str, float]]) -> list[Document]:
+        scores, docs = {}, {}
+        for rank, doc in enumerate(vector_docs, 1):
+            key = doc.id or doc.metadata.get("hash") or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank)
+            docs[key] = doc
+        for rank, (_id, _) in enumerate(lexical_hits, 1):
+            scores[_id] = scores.get(_id, 0.0) + 1.0 / (self.rrf_k + rank)
+
+        top = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        missing = [key for key in top if key not in docs]
+        for doc in get_documents_by_ids(self.vectorstore, missing):
+            docs[doc.id] = doc
+
+        results = []
+        for key in top:
+            if key in docs:
+                doc = docs[key]
+                doc.metadata["rrf_score"] = scores[key]
+                results.append(doc)
+        return results
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        vec = self.embedding.embed_query(query)
+        vector_docs = self.vectorstore.similarity_search_by_vector(vec, k=self.fetch_k)
+        return self._fuse(vector_docs, self.bm25.search(query, self.fetch_k))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        async def vector_search():
+            vec = await self.embedding.aembed_query(query)
+            return await asyncio.to_thread(self.vectorstore.similarity_search_by_vector, vec, k=self.fetch_k)
+
+        vector_docs, lexical_hits = await asyncio.gather(
+            vector_search(),
+            asyncio.to_thread(self.bm25.search, query, self.fetch_k),
+        )
+        return await asyncio.to_thread(self._fuse, vector_docs, lexical_hits)
+
+
 class RAG:
-    def __init__(self, data_path, db_path, cache_path, mode=RunMode.ONLINE):
+    def __init__(
+        self,
+        data_path,
+        db_path,
+        cache_path,
+        mode=RunMode.ONLINE,
+        embedding_config=None,
+        loader_config=None,
+        build_config=None,
+        splitter_config=None,
+        retriever_config=None,
+    ):
+        """
+        :param embedding_config: 透传给 CacheEmbedding 的参数（对应 config.yaml 的 embedding 段，如 backend）
+        :param loader_config: 透传给 MultiLoader 的参数（对应 config.yaml 的 loader 段，如 workers）
+        :param build_config: 离线构建参数（对应 config.yaml 的 build 段）
+            streaming: 是否流式构建（加载 → 切分 → 入库按批进行，内存占用与语料规模无关），默认 False
+            insert_batch_size: 流式构建时每批写入 Chroma 的段数，默认 256
+            incremental: 是否按文件指纹增量索引（只处理新增/修改/删除的文件），默认 False
+        :param splitter_config: 透传给 HybridTextSplitter 的参数（对应 config.yaml 的 splitter 段，如 split_mode）
+        :param retriever_config: 检索参数（对应 config.yaml 的 retriever 段）
+            search_type: "vector" 仅向量检索；"hybrid" BM25 + 向量检索并按 RRF 融合，默认 "vector"
+            k: 返回段数，默认 4
+            fetch_k: 混合检索时每一路的候选数，默认 20
+            rrf_k: RRF 平滑常数，默认 60
+        """
         self.data_path = data_path
         self.db_path = db_path
         self.cache_path = cache_path
-        self.loader = MultiLoader(self.data_path)
-        self.splitter = HybridTextSplitter(self.cache_path)
-        self.embedding = self.splitter.embedding_model
+        self.loader = MultiLoader(self.data_path, **(loader_config or {}))
+        self.embedding = CacheEmbedding(self.cache_path, **(embedding_config or {}))
+        self.splitter = HybridTextSplitter(
+            self.cache_path,
+            embedding_model=self.embedding,
+            **(splitter_config or {}),
+        )
         self.mode = mode
+        build_config = build_config or {}
+        self.streaming = build_config.get("streaming", False)
+        self.insert_batch_size = build_config.get("insert_batch_size", 256)
+        self.incremental = build_config.get("incremental", False)
+        self.manifest_path = os.path.join(self.db_path, "index_manifest.json")
+        retriever_config = retriever_config or {}
+        self.search_type = retriever_config.get("search_type", "vector")
+        self.k = retriever_config.get("k", 4)
+        self.fetch_k = retriever_config.get("fetch_k", 20)
+        self.rrf_k = retriever_config.get("rrf_k", 60)
+        self.bm25_path = os.path.join(self.db_path, "bm25_index.pkl")
 
     def _process_documents(self):
         docs = self.loader.load()
         print("文件加载完成")
 
-        docs = self.splitter.split(docs)
+        docs = self._with_hash(self.splitter.split(docs))
         print("文档切分完成")
         return docs
 
+    def _stream_documents(self):
+        """流式加载并切分，按批产出文档段"""
+        self.splitter.reset_filter()
+        docs = self.loader.lazy_load()
+        for batch in self.splitter.split_stream(docs, batch_size=self.insert_batch_size):
+            yield self._with_hash(batch)
+
     @staticmethod
     def make_md5(text: str):
         if not text:
             return ""
         return hashlib.md5(text.encode("utf-8")).hexdigest()
 
+    def _with_hash(self, docs):
+        """给文档段补上内容哈希，追加入库时据此去重"""
+        for doc in docs:
+            doc.metadata["hash"] = self.make_md5(doc.page_content)
+        return docs
+
     # ==========================
     # 离线模式功能
     # ==========================
 
     def _build_db(self):
+        if self.streaming:
+            return self._build_db_streaming()
+
         docs = self._process_documents()
         db = Chroma.from_documents(
             documents=docs,
@@ -52,13 +206,31 @@ class RAG:
         print("✅ 向量数据库构建完成")
         return db
 
+    def _build_db_streaming(self):
+        db = Chroma(
+            persist_directory=self.db_path,
+            embedding_function=self.embedding
+        )
+        total = 0
+        for batch in self._stream_documents():
+            if not batch:
+                continue
+            db.add_documents(documents=batch)
+            total += len(batch)
+            print(f"  → 已写入 {total} 段")
+        print("✅ 向量数据库构建完成")
+        return db
+
     def _append_db(self, db):
-        docs = self._process_documents()
         exist_docs = set(
             m.get("hash")
             for m in db.get(include=["metadatas"])["metadatas"]
             if m.get("hash")    # 不存在返回 None
         )
+        if self.streaming:
+            return self._append_db_streaming(db, exist_docs)
+
+        docs = self._process_documents()
         docs = [d for d in docs if self.make_md5(d.page_content) not in exist_docs]
 
         if not docs:
@@ -68,14 +240,139 @@ class RAG:
         db.add_documents(documents=docs)
         return db
 
+    def _append_db_streaming(self, db, exist_docs):
+        total = 0
+        for batch in self._stream_documents():
+            batch = [d for d in batch if self.make_md5(d.page_content) not in exist_docs]
+            if not batch:
+                continue
+            db.add_documents(documents=batch)
+            total += len(batch)
+            print(f"  → 已追加 {total} 段")
+
+        if not total:
+            print("🟡 没有检测到新文档，数据库无需更新")
+        return db
+
+    @staticmethod
+    def _delete_chunks(db, chunk_ids):
+        if chunk_ids:
+            db.delete(ids=chunk_ids)
+
+    def _sync_db(self, db):
+        """
+        按文件指纹增量同步：
+        - 大小和修改时间未变的文件直接跳过；变了但内容哈希相同的只更新指纹
+        - 新增/修改的文件重新加载切分，修改文件的旧段先删除
+        - 已从数据目录移除的文件，删除它的所有段
+        - 数据库由旧版（无索引清单）构建时，先按 source 删除每个文件已有的段再写入，避免整库重复
+        """
+        manifest = IndexManifest(self.manifest_path)
+        db_empty = not db.get(limit=1)["ids"]
+        items = self.loader.list_items()
+        legacy = False
+        if manifest.entries and db_empty:
+            print("⚠️ 索引清单存在但数据库为空，将重新索引所有文件")
+            manifest.entries = {}
+        elif not manifest.entries and not db_empty:
+            # 旧版构建的数据库：段 id 是随机 uuid，只能按 source 找到每个文件的旧段
+            if any(self.loader.item_path(item) is None for item in items):
+                raise RuntimeError(
+                    "❌ 数据库由旧版构建且没有索引清单，huggingface 数据集的旧段无法定位，"
+                    f"请删除 {self.db_path} 后重新构建"
+                )
+            print("🔄 数据库没有索引清单，将按 source 替换每个文件的旧段并建立清单")
+            legacy = True
+
+        fingerprints, changed = {}, []
+        for item in items:
+            entry = manifest.get(item)
+            path = self.loader.item_path(item)
+            if path is None:
+                # huggingface 数据集按名称记录，只加载一次
+                if entry is None:
+                    fingerprints[item] = (0, 0, self.make_md5(item))
+                    changed.append(item)
+                continue
+            size, mtime = manifest.stat(path)
+            if entry and (entry["size"], entry["mtime"]) == (size, mtime):
+                continue
+            content_hash = manifest.content_hash(path)
+            if entry and entry["hash"] == content_hash:
+                manifest.set(item, size, mtime, content_hash, entry["chunk_ids"])
+                continue
+            fingerprints[item] = (size, mtime, content_hash)
+            changed.append(item)
+
+        removed = set(manifest.items()) - set(items)
+        for item in removed:
+            self._delete_chunks(db, manifest.pop(item)["chunk_ids"])
+
+        added = 0
+        for i, (item, docs) in enumerate(self.loader.iter_files(changed), 1):
+            old = manifest.pop(item)
+            if old:
+                self._delete_chunks(db, old["chunk_ids"])
+            if legacy:
+                for source in {self.loader.item_path(item)} | {d.metadata.get("source") for d in docs}:
+                    if source:
+                        db.delete(where={"source": source})
+            errors = [d.metadata["error"] for d in docs if d.metadata.get("error")]
+            if errors:
+                print(f"⚠️ 加载失败，下次构建时重试: {item} ({errors[0]})")
+                continue
+
+            size, mtime, content_hash = fingerprints[item]
+            prefix = f"{self.make_md5(item)}-{content_hash[:12]}"
+            chunk_ids = []
+            # 增量同步只在文件内去重：跨文件去重会让未变化文件的段依赖于别的文件，
+            # 被保留的那份随其文件修改或删除后，未变化的文件不会重新切分，内容就丢失了
+            self.splitter.reset_filter()
+            for batch in self.splitter.split_stream(docs, batch_size=self.insert_batch_size):
+                if not batch:
+                    continue
+                ids = [f"{prefix}-{len(chunk_ids) + j}" for j in range(len(batch))]
+                db.add_documents(documents=self._with_hash(batch), ids=ids)
+                chunk_ids.extend(ids)
+            manifest.set(item, size, mtime, content_hash, chunk_ids)
+            added += len(chunk_ids)
+            # 迁移旧库时只在最后保存清单：中途中断后清单仍为空，下次仍按 source 替换，不会遗留旧段
+            if i % 50 == 0 and not legacy:
+                manifest.save()
+        manifest.save()
+
+        print(f"✅ 增量同步完成：处理 {len(changed)} 个新增/修改文件（{added} 段），"
+              f"删除 {len(removed)} 个文件，跳过 {len(items) - len(changed)} 个未变文件")
+        return db
+
+    def _sync_bm25(self, db):
+        """离线构建后与 Chroma 集合同步 BM25 索引（只对新增段分词）并持久化"""
+        bm25 = BM25Index.load(self.bm25_path) if os.path.exists(self.bm25_path) else BM25Index()
+        added, removed = bm25.sync(db)
+        bm25.save(self.bm25_path)
+        print(f"✅ BM25 索引同步完成：新增 {added} 段，删除 {removed} 段，共 {len(bm25)} 段")
+        return bm25
+
     # ==========================
     # 在线/离线共用检索器
     # ==========================
 
+    def index_version(self):
+        """知识库索引版本：持久化文件的最新修改时间，离线重建或增量同步后会变化"""
+        version = 0
+        for name in ("chroma.sqlite3", "index_manifest.json", "bm25_index.pkl"):
+            path = os.path.join(self.db_path, name)
+            if os.path.exists(path):
+                version = max(version, os.stat(path).st_mtime_ns)
+        return version
+
     def get_retriever(self):
         if not os.path.exists(self.db_path) or not os.listdir(self.db_path):
             print("⚠️ 未检测到持久化文件，正在重新构建数据库...")
-            if self.mode == RunMode.OFFLINE:
+            if self.mode == RunMode.OFFLINE and self.incremental:
+                os.makedirs(self.db_path, exist_ok=True)
+                db = self._sync_db(Chroma(persist_directory=self.db_path, embedding_function=self.embedding))
+            elif self.mode == RunMode.OFFLINE:
                 db = self._build_db()
             else:
                 raise RuntimeError("❌ 在线模式下无法构建新数据库，请先运行离线模式初始化")
@@ -83,10 +380,30 @@ class RAG:
             print("✅ 加载已有数据库...")
             db = Chroma(
                 persist_directory=self.db_path,
-                embedding_function=CacheEmbedding(self.cache_path)
+                embedding_function=self.embedding
             )
 
-            if self.mode == RunMode.OFFLINE:
+            if self.mode == RunMode.OFFLINE and self.incremental:
+                db = self._sync_db(db)
+            elif self.mode == RunMode.OFFLINE:
                 db = self._append_db(db)
-        retriever = db.as_retriever()
+
+        if self.search_type == "hybrid":
+            if self.mode == RunMode.OFFLINE:
+                bm25 = self._sync_bm25(db)
+            elif os.path.exists(self.bm25_path):
+                bm25 = BM25Index.load(self.bm25_path)
+            else:
+                bm25 = None
+                print("⚠️ 未找到 BM25 索引，退回仅向量检索，请先运行离线模式构建")
+            if bm25 is not None:
+                return HybridRetriever(
+                    vectorstore=db,
+                    embedding=self.embedding,
+                    bm25=bm25,
+                    k=self.k,
+                    fetch_k=self.fetch_k,
+                    rrf_k=self.rrf_k,
+                )
+        retriever = VectorRetriever(vectorstore=db, embedding=self.embedding, k=self.k)
         return retriever
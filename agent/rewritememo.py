@@ -0,0 +1,94 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Optional
+
+_SPACES = re.compile(r"\s+")
+_TRAILING_PUNCT = re.compile(r"[\s?？!！。.,，;；~～]+$")
+
+
+class RewriteMemo:
+    """
+    改写链与检索结果的持久化备忘（sqlite）：
+    - rewrites: (规范化原问题, 第几次改写) -> 改写后的查询，以及该次检索的评审结果
+    - retrievals: 规范化查询 -> 检索到的段 id
+    两张表都记录知识库索引版本，版本变化后旧记录不再命中
+    """
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rewrites ("
+                "question TEXT, attempt INTEGER, query TEXT, grade TEXT, version INTEGER, "
+                "PRIMARY KEY (question, attempt))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS retrievals ("
+                "query TEXT PRIMARY KEY, chunk_ids TEXT, version INTEGER)"
+            )
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = unicodedata.normalize("NFKC", text).lower().strip()
+        return _TRAILING_PUNCT.sub("", _SPACES.sub(" ", text))
+
+    def get_rewrite(self, question: str, attempt: int, version) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT query FROM rewrites WHERE question = ? AND attempt = ? AND version = ?",
+                (self.normalize(question), attempt, version),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_rewrite(self, question: str, attempt: int, query: str, version):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rewrites (question, attempt, query, grade, version) VALUES (?, ?, ?, NULL, ?)",
+                (self.normalize(question), attempt, query, version),
+            )
+
+    def set_grade(self, question: str, attempt: int, grade: str, version):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE rewrites SET grade = ? WHERE question = ? AND attempt = ? AND version = ?",
+                (grade, self.normalize(question), attempt, version),
+            )
+
+    def resume_point(self, question: str, version) -> Optional[tuple[int, str]]:
+        """
+        同一问题之前走过的改写链中，应直接开始的那一次 (attempt, query)：
+        曾经评审通过的那次；都没通过则取最后一次改写
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT attempt, query, grade FROM rewrites WHERE question = ? AND version = ? AND attempt > 0 "
+                "ORDER BY attempt",
+                (self.normalize(question), version),
+            ).fetchall()
+        if not rows:
+            return None
+        for attempt, query, grade in rows:
+            if grade == "yes":
+                return attempt, query
+        return rows[-1][0], rows[-1][1]
+
+    def get_retrieval(self, query: str, version) -> Optional[list[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunk_ids FROM retrievals WHERE query = ? AND version = ?",
+                (self.normalize(query), version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_retrieval(self, query: str, chunk_ids: list[str], version):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO retrievals (query, chunk_ids, version) VALUES (?, ?, ?)",
+                (self.normalize(query), json.dumps(chunk_ids), version),
+            )
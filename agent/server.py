@@ -3,6 +3,7 @@ import grpc
 import os
 import asyncio
 import sys
+import uuid
 from pathlib import Path
 from typing import AsyncIterator
 
@@ -12,10 +13,58 @@ import agent_pb2, agent_pb2_grpc
 from agent import Agent, Receipt
 
 class AgentServiceServicer(agent_pb2_grpc.AgentServiceServicer):
-    def __init__(self, agent: Agent):
+    def __init__(self, agent: Agent, max_concurrency: int = 4):
+        """
+        :param max_concurrency: 单个 Chat 流内同时处理的请求数上限
+        """
         self.agent = agent
+        self.max_concurrency = max_concurrency
         logging.info("AgentServiceServicer initialized with Agent instance.")
 
+    async def _handle(
+        self,
+        chat_req: agent_pb2.ChatReq,
+        request_id: str,
+        previous: asyncio.Task | None,
+        semaphore: asyncio.Semaphore,
+        queue: asyncio.Queue,
+        user_id: str,
+        timeout: float | None,
+    ):
+        """
+        处理单个请求，响应放入队列；同一 thread_id 的请求等前一个完成后再开始
+        :param timeout: 收到请求时 RPC 的剩余时间（客户端未设置 deadline 时为 None，使用 Agent 的默认时限）
+        """
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        def tagged(**kwargs):
+            return agent_pb2.ChatResp(thread_id=chat_req.thread_id, request_id=request_id, **kwargs)
+
+        async with semaphore:
+            try:
+                # 调用 agent 流式处理：先逐个转发 token，最后发送带 final 标记的完整回答和来源
+                async for kind, payload in self.agent.astream(
+                    query=chat_req.query,
+                    thread_id=chat_req.thread_id,
+                    timeout=timeout,
+                ):
+                    if kind == "token":
+                        await queue.put(tagged(response=payload))
+                        continue
+
+                    if type(payload) == Receipt:
+                        chat_resp = tagged(response=payload.answer, final=True, sources=payload.source or [])
+                    else:
+                        chat_resp = tagged(response=str(payload), final=True)
+                    await queue.put(chat_resp)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 单个请求出错不影响同一流内的其他请求，以 final 消息返回错误
+                logging.error(f"Error processing request {request_id} from user_id={user_id}: {e}")
+                await queue.put(tagged(response=f"Error processing request: {str(e)}", final=True))
+
     async def Chat(
         self, 
         request_iterator: AsyncIterator[agent_pb2.ChatReq],
@@ -23,34 +72,65 @@ class AgentServiceServicer(agent_pb2_grpc.AgentServiceServicer):
     ) -> AsyncIterator[agent_pb2.ChatResp]:
         """
         双向流式 RPC 方法，处理来自客户端的聊天请求并返回响应。
+        同一流内的请求并发处理（最多 max_concurrency 个），同一 thread_id 的请求按到达顺序依次处理；
+        每个响应都带有对应请求的 thread_id 和 request_id，不同请求的响应可能交错到达。
         """
         metadata = dict(context.invocation_metadata())
         user_id = metadata.get("user_id", "unknown")
 
-        try:
-            async for chat_req in request_iterator:
-                logging.info(f"Received chat request from user_id={user_id}: {chat_req.query}")
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks: set[asyncio.Task] = set()
+        last_by_thread: dict[str, asyncio.Task] = {}
 
-                try:
-                    # 调用 agent 处理
-                    response = await self.agent.ainvoke(
-                        query=chat_req.query,
-                        thread_id=chat_req.thread_id,
-                    )
+        def _done(thread_id: str, task: asyncio.Task):
+            tasks.discard(task)
+            if last_by_thread.get(thread_id) is task:
+                del last_by_thread[thread_id]
 
-                    if type(response) == Receipt:
-                        answer = response.answer
-                    else:
-                        answer = str(response)
+        async def _read_requests():
+            async for chat_req in request_iterator:
+                request_id = chat_req.request_id or str(uuid.uuid4())
+                logging.info(f"Received chat request {request_id} from user_id={user_id}: {chat_req.query}")
+                thread_id = chat_req.thread_id
+                # 客户端设置的 deadline 作为本请求的时限，随 RunnableConfig 传入子图和工具
+                timeout = context.time_remaining()
+                task = asyncio.create_task(self._handle(
+                    chat_req, request_id, last_by_thread.get(thread_id), semaphore, queue, user_id, timeout,
+                ))
+                tasks.add(task)
+                last_by_thread[thread_id] = task
+                task.add_done_callback(lambda t, thread_id=thread_id: _done(thread_id, t))
+            # 客户端不再发送请求，等所有请求处理完后结束响应流
+            if tasks:
+                await asyncio.gather(*tasks)
+            await queue.put(None)
 
-                    chat_resp = agent_pb2.ChatResp(response=answer)
-                    yield chat_resp
-                except Exception as e:
-                    logging.error(f"Error processing request from user_id={user_id}: {e}")
-                    await context.abort(grpc.StatusCode.INTERNAL, f"Error processing request: {str(e)}")
+        reader = asyncio.create_task(_read_requests())
+        try:
+            while True:
+                if reader.done():
+                    # 读取请求出错时直接抛出；正常结束时队列末尾已有结束标记
+                    reader.result()
+                    chat_resp = await queue.get()
+                else:
+                    getter = asyncio.create_task(queue.get())
+                    done, _ = await asyncio.wait([getter, reader], return_when=asyncio.FIRST_COMPLETED)
+                    if getter not in done:
+                        getter.cancel()
+                        continue
+                    chat_resp = getter.result()
+                if chat_resp is None:
+                    break
+                yield chat_resp
         except Exception as e:
             logging.error(f"Stream error: {e}")
             await context.abort(grpc.StatusCode.INTERNAL, f"Stream error: {str(e)}")
+        finally:
+            # 流结束、客户端取消或超过 deadline 时，取消仍在处理的请求（包括其中的子图和工具调用）
+            reader.cancel()
+            for task in list(tasks):
+                task.cancel()
 
 async def serve(host: str = "[::]:50052", max_workers: int = 100):
     """
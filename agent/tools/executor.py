@@ -0,0 +1,94 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Optional
+
+import yaml
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from deadline import get_deadline, with_deadline
+
+current_script_path = Path(__file__).resolve()
+project_root = current_script_path.parent.parent.parent
+
+config_path = project_root / 'config.yaml'
+with open(config_path, "r", encoding="utf-8") as f:
+    config = yaml.safe_load(f)
+
+tool_executor_config = config.get("tool_executor", {})
+deadline_config = config.get("deadline", {})
+
+
+class ToolExecutor:
+    """
+    并发执行同一步的多个工具调用：
+    - asyncio.gather 并发，信号量限制同时执行的工具数
+    - 每个工具单独超时，超时或异常只影响该调用，以 "Error: ..." 作为结果返回
+    - 返回的 ToolMessage 顺序与 tool_calls 一致
+    - 请求有截止时间时，超时取工具超时与剩余时间（扣除 reserve）中较小的一个，并作为截止时间传给工具
+    """
+    def __init__(
+        self,
+        tools: list[BaseTool],
+        max_concurrency=4,
+        timeout: Optional[float] = None,
+        tool_timeouts: Optional[dict[str, float]] = None,
+        reserved: Optional[dict[str, str]] = None,
+        reserve: float = 0,
+    ):
+        """
+        :param max_concurrency: 同时执行的工具调用数上限
+        :param timeout: 单个工具调用的默认超时（秒），None 表示不限制
+        :param tool_timeouts: 按工具名覆盖超时
+        :param reserved: 不在此执行的工具名 -> 直接返回的结果（例如由其他节点处理的工具）
+        :param reserve: 截止时间前留给调用方汇总作答的秒数，工具必须在此之前结束
+        """
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self.reserved = reserved or {}
+        self.reserve = reserve
+
+    async def _run_one(self, tool_call: dict, semaphore: asyncio.Semaphore, deadline: Optional[float]) -> str:
+        name = tool_call["name"]
+        if name in self.reserved:
+            return self.reserved[name]
+        if name not in self.tools_by_name:
+            return f"Error: 调用不存在的工具 {name}"
+
+        async with semaphore:
+            timeout = self.tool_timeouts.get(name, self.timeout)
+            if deadline is not None:
+                left = deadline - self.reserve - time.monotonic()
+                if left <= 0:
+                    print(f"⏱️ 剩余时间不足，跳过工具 {name}")
+                    return f"Error: 剩余时间不足，未执行工具 {name}，请根据已有信息作答"
+                timeout = left if timeout is None else min(timeout, left)
+            # 工具（及其中的子图）按这个截止时间降级，尽量在被取消前返回部分结果
+            tool_deadline = time.monotonic() + timeout if timeout is not None else None
+            try:
+                output = await asyncio.wait_for(
+                    self.tools_by_name[name].ainvoke(tool_call["args"], with_deadline(tool_deadline)),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                print(f"⏱️ 工具 {name} 超时 ({timeout:.1f}s)")
+                return f"Error: 工具 {name} 执行超时（{timeout:.1f}s）"
+            except Exception as e:
+                return f"Error: {e}"
+        return str(output)
+
+    async def arun(self, tool_calls: list[dict], config: Optional[RunnableConfig] = None) -> list[ToolMessage]:
+        """
+        :param config: 节点收到的 RunnableConfig，从中读取请求截止时间
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        deadline = get_deadline(config)
+        outputs = await asyncio.gather(*(self._run_one(call, semaphore, deadline) for call in tool_calls))
+        return [
+            ToolMessage(content=output, tool_call_id=call["id"])
+            for call, output in zip(tool_calls, outputs)
+        ]
@@ -38,7 +38,23 @@ class ToolFactory:
             data_path = config["loader"]["data_path"]
             db_path = config["retriever"]["db_path"]
             cache_path = config["embedding"]["cache_path"]
-            tools.append(RagTool(data_path, db_path, cache_path).build())
+            embedding_config = {k: v for k, v in config["embedding"].items() if k != "cache_path"}
+            loader_config = {k: v for k, v in config["loader"].items() if k != "data_path"}
+            build_config = config.get("build", {})
+            splitter_config = config.get("splitter", {})
+            retriever_config = {k: v for k, v in config["retriever"].items() if k != "db_path"}
+            tools.append(
+                RagTool(
+                    data_path,
+                    db_path,
+                    cache_path,
+                    embedding_config,
+                    loader_config,
+                    build_config,
+                    splitter_config,
+                    retriever_config,
+                ).build()
+            )
         # if self.enable_calculator:
         #     tools.append(CalculatorTool().build())
         return tools
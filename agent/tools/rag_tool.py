@@ -18,6 +18,16 @@ with open(config_path, "r", encoding="utf-8") as f:
 data_path = project_root / config["loader"]["data_path"]
 cache_path = project_root / config["embedding"]["cache_path"]
 db_path = project_root / config["retriever"]["db_path"]
+embedding_config = {k: v for k, v in config["embedding"].items() if k != "cache_path"}
+loader_config = {k: v for k, v in config["loader"].items() if k != "data_path"}
+build_config = config.get("build", {})
+splitter_config = config.get("splitter", {})
+retriever_config = {k: v for k, v in config["retriever"].items() if k != "db_path"}
+rerank_config = config.get("rerank", {})
+answer_cache_config = config.get("answer_cache", {})
+rag_agent_config = dict(config.get("rag_agent", {}))
+if rag_agent_config.get("memo_path"):
+    rag_agent_config["memo_path"] = project_root / rag_agent_config["memo_path"]
 
 
 class RagTool(BaseToolWrapper):
@@ -28,16 +38,42 @@ class RagTool(BaseToolWrapper):
     对于闲聊、反问、总结、情绪、历史对话类问题，请直接回答，不要调用本工具。
     """
 
-    def __init__(self, data_path, db_path, cache_path):
+    def __init__(
+        self,
+        data_path,
+        db_path,
+        cache_path,
+        embedding_config=None,
+        loader_config=None,
+        build_config=None,
+        splitter_config=None,
+        retriever_config=None,
+    ):
         super().__init__()
         self.data_path = data_path
         self.db_path = db_path
         self.cache_path = cache_path
+        self.embedding_config = embedding_config
+        self.loader_config = loader_config
+        self.build_config = build_config
+        self.splitter_config = splitter_config
+        self.retriever_config = retriever_config
+        self.rag = None
+        self.retriever = None
 
     def build(self):
         from retriever import RAG
-        rag = RAG(self.data_path, self.db_path, self.cache_path)
-        retriever = rag.get_retriever()
+        self.rag = rag = RAG(
+            self.data_path,
+            self.db_path,
+            self.cache_path,
+            embedding_config=self.embedding_config,
+            loader_config=self.loader_config,
+            build_config=self.build_config,
+            splitter_config=self.splitter_config,
+            retriever_config=self.retriever_config,
+        )
+        self.retriever = retriever = rag.get_retriever()
 
         class ArgSchema(BaseModel):
             query: str = Field(description="用户输入内容")
@@ -58,4 +94,14 @@ class RagTool(BaseToolWrapper):
         )
 
 
-rag_retriever = RagTool(data_path, db_path, cache_path).build()
+# 只保存配置，build() 时才加载嵌入模型和打开 Chroma（由 RAGAgent.build 在首次使用或预热时调用）
+rag_tool = RagTool(
+    data_path,
+    db_path,
+    cache_path,
+    embedding_config,
+    loader_config,
+    build_config,
+    splitter_config,
+    retriever_config,
+)
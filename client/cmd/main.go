@@ -72,18 +72,42 @@ func Chat(ctx context.Context, client proto.AgentServiceClient) {
 			return
 		}
 
-		// Recv
-		resp, err := stream.Recv()
-		if err == io.EOF {
-			log.Println("Server close")
-			return
-		}
-		if err != nil {
-			log.Println("[Error] Recving response failed:", err)
-			return
-		}
+		// Recv: token chunks until the final message
+		var streamed strings.Builder
+		for {
+			resp, err := stream.Recv()
+			if err == io.EOF {
+				log.Println("Server close")
+				return
+			}
+			if err != nil {
+				log.Println("[Error] Recving response failed:", err)
+				return
+			}
 
-		fmt.Printf("\r\033[32m🤖: %s\033[0m\n", resp.Response)
+			if !resp.Final {
+				if streamed.Len() == 0 {
+					fmt.Print("\r\033[32m🤖: ")
+				}
+				streamed.WriteString(resp.Response)
+				fmt.Print(resp.Response)
+				continue
+			}
+
+			if streamed.Len() > 0 {
+				fmt.Print("\033[0m\n")
+				// The streamed tokens may be only part of the answer (e.g. the final answer was reformatted)
+				if resp.Response != "" && resp.Response != streamed.String() {
+					fmt.Printf("\033[32m🤖: %s\033[0m\n", resp.Response)
+				}
+			} else {
+				fmt.Printf("\r\033[32m🤖: %s\033[0m\n", resp.Response)
+			}
+			if len(resp.Sources) > 0 {
+				fmt.Printf("📚 %s\n", strings.Join(resp.Sources, ", "))
+			}
+			break
+		}
 	}
 }
 